@@ -10,20 +10,33 @@ Usage:
 出力: JSON形式のページデータ
 """
 
+import hashlib
+import importlib.metadata
 import json
 import os
 import re
+import signal
 import subprocess
 import sys
 
 import time
 import traceback
-from urllib.parse import urljoin, urlparse
+from pathlib import Path
+from urllib.parse import urljoin, urlparse, urlsplit
 
 try:
     from playwright.sync_api import sync_playwright
+    from playwright.sync_api import Error as PlaywrightError
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 except ImportError:
     sync_playwright = None
+    PlaywrightError = RuntimeError
+    PlaywrightTimeoutError = TimeoutError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 def log(msg: str):
@@ -34,37 +47,301 @@ def log_error(msg: str):
     print(msg, file=sys.stderr, flush=True)
 
 
+# Playwright ブラウザ確認結果のスタンプ（有効期間内はディレクトリ走査も省略する）
+PLAYWRIGHT_OK_TTL = 7 * 24 * 60 * 60  # 1週間
+
+
+def _kill_process_tree(proc: subprocess.Popen):
+    """子プロセスを孫プロセスごと終了させる（node のダウンローダーが残らないように）"""
+    try:
+        if sys.platform == "win32":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30,
+            )
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except (OSError, subprocess.SubprocessError) as e:
+        log_error(f"プロセス終了エラー: {e}")
+        proc.kill()
+
+
 def install_playwright_browsers():
     """Playwright のブラウザバイナリをインストールする (chromium のみ)"""
     log("Playwright ブラウザをインストール中...")
-    result = subprocess.run(
+    # タイムアウト時にプロセスツリーごと終了できるよう、別グループで起動する
+    if sys.platform == "win32":
+        group_kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        group_kwargs = {"start_new_session": True}
+    proc = subprocess.Popen(
         [sys.executable, "-m", "playwright", "install", "chromium"],
-        capture_output=True, text=True, timeout=300
+        # 進捗バーの出力は使わないので捨て、エラー表示用に stderr だけ受け取る
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, **group_kwargs
     )
-    if result.returncode != 0:
-        log(f"Playwright ブラウザインストールエラー: {result.stderr}")
+    try:
+        _, stderr = proc.communicate(timeout=300)
+    except subprocess.TimeoutExpired:
+        _kill_process_tree(proc)
+        proc.communicate()
+        raise RuntimeError("Playwright ブラウザのインストールがタイムアウトしました")
+    if proc.returncode != 0:
+        log(f"Playwright ブラウザインストールエラー: {stderr}")
         raise RuntimeError("Playwright ブラウザのインストールに失敗しました")
     log("Playwright ブラウザのインストール完了")
 
 
+def _playwright_browsers_dir() -> Path:
+    """Playwright がブラウザバイナリを配置するディレクトリを返す"""
+    env_path = os.environ.get("PLAYWRIGHT_BROWSERS_PATH")
+    if env_path == "0":
+        import playwright
+        return Path(playwright.__file__).parent / "driver" / "package" / ".local-browsers"
+    if env_path:
+        return Path(env_path)
+    if sys.platform == "win32":
+        local_app_data = os.environ.get("LOCALAPPDATA") or str(Path.home() / "AppData" / "Local")
+        return Path(local_app_data) / "ms-playwright"
+    if sys.platform == "darwin":
+        return Path.home() / "Library" / "Caches" / "ms-playwright"
+    return Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "ms-playwright"
+
+
+def _playwright_stamp_path() -> Path:
+    """
+    ブラウザ確認済みスタンプのパス。ブラウザの配置先に Playwright のバージョンごとに置くので、
+    配置先が消えたり Playwright を更新したりすると自動的に無効になる。
+    """
+    try:
+        version = importlib.metadata.version("playwright")
+    except importlib.metadata.PackageNotFoundError:
+        version = "unknown"
+    return _playwright_browsers_dir() / f".markitdown-gui-ok-{version}"
+
+
+def _write_playwright_stamp(chromium_dir: str):
+    """ブラウザ確認済みスタンプに chromium のディレクトリ名を書き込む（失敗しても処理は続行）"""
+    try:
+        _playwright_stamp_path().write_text(chromium_dir, encoding="utf-8")
+    except OSError as e:
+        log_error(f"Playwright 確認スタンプの書き込みに失敗: {e}")
+
+
+def _clear_playwright_stamp():
+    """ブラウザ確認済みスタンプを削除する"""
+    try:
+        _playwright_stamp_path().unlink(missing_ok=True)
+    except OSError as e:
+        log_error(f"Playwright 確認スタンプの削除に失敗: {e}")
+
+
 def check_playwright_browsers() -> bool:
-    """Playwright の chromium ブラウザが利用可能かチェックする"""
+    """
+    Playwright の chromium ブラウザが利用可能かチェックする。
+    ブラウザを実際に起動せず、インストール完了マーカーの有無で判定する。
+    """
     if sync_playwright is None:
         return False
+
+    # スタンプが有効期間内なら、記録した chromium ディレクトリの存在だけ確かめる
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch(headless=True)
-            browser.close()
-        return True
-    except (OSError, RuntimeError, Exception) as e:
+        stamp = _playwright_stamp_path()
+        if time.time() - stamp.stat().st_mtime < PLAYWRIGHT_OK_TTL:
+            chromium_dir = stamp.read_text(encoding="utf-8").strip()
+            if chromium_dir and (stamp.parent / chromium_dir / "INSTALLATION_COMPLETE").exists():
+                return True
+    except (OSError, ImportError):
+        pass
+
+    try:
+        browsers_dir = _playwright_browsers_dir()
+        # playwright install は各ブラウザディレクトリに INSTALLATION_COMPLETE を作成する
+        marker = next(browsers_dir.glob("chromium*/INSTALLATION_COMPLETE"), None)
+    except (OSError, ImportError) as e:
         log_error(f"Playwright ブラウザ確認エラー: {e}")
         return False
 
+    if marker is None:
+        return False
+    _write_playwright_stamp(marker.parent.name)
+    return True
+
+
+def _disable_playwright_stack_inspection():
+    """
+    旧バージョンの Playwright は API 呼び出しごとに inspect.stack() で呼び出し元を
+    記録しており、DOM 操作の多いスクレイピングでは CPU 時間の大半を占める。
+    PW_INSPECT_STACK=0（既定）のときは inspect.stack を空リストを返す関数に差し替える。
+    フレームを直接辿る新しいバージョン（_capture_stack_trace を持つ）では何もしない。
+    """
+    if os.environ.get("PW_INSPECT_STACK", "0") != "0":
+        return
+    try:
+        from playwright._impl import _connection
+    except ImportError:
+        return
+    if hasattr(_connection, "_capture_stack_trace"):
+        return
+
+    import inspect
+    inspect.stack = lambda *args, **kwargs: []
+    log("Playwright の呼び出し元スタック記録を無効化しました")
+
+
+# 使わない機能を止めてバックグラウンド通信とメモリを減らす起動オプション
+BROWSER_ARGS = [
+    "--disable-features=Translate,BackForwardCache,AcceptCHFrame,MediaRouter,OptimizationHints",
+    "--disable-background-networking",
+    "--disable-sync",
+    "--disable-default-apps",
+    "--disable-dev-shm-usage",
+    "--disable-blink-features=AutomationControlled",
+]
+
+
+def _launch_browser(p):
+    """
+    chromium を起動する。
+    確認スタンプが古くバイナリが消えていた場合は再インストールしてリトライする。
+    """
+    try:
+        return p.chromium.launch(headless=True, args=BROWSER_ARGS)
+    except Exception as e:
+        if "Executable doesn't exist" not in str(e):
+            raise
+        log_error(f"ブラウザバイナリが見つかりません: {e}")
+        _clear_playwright_stamp()
+        install_playwright_browsers()
+        return p.chromium.launch(headless=True, args=BROWSER_ARGS)
+
+
+def _wait_for_page_ready(page, strategy: dict | None):
+    """
+    ページの読み込み完了を待つ。
+    networkidle は解析ビーコン等で成立しないことが多いため、戦略があれば
+    コンテンツのセレクタ出現を、なければ load イベントを待つ。
+    タイムアウトした場合のみ networkidle にフォールバックする。
+    """
+    selector = None
+    if strategy:
+        content_selectors = strategy.get("content_selectors", {})
+        selector = content_selectors.get("items") or content_selectors.get("main_container")
+
+    try:
+        if selector:
+            page.wait_for_selector(selector, state="attached", timeout=15000)
+        else:
+            page.wait_for_load_state("load", timeout=15000)
+        return
+    except PlaywrightError as e:
+        log_error(f"読み込み待機がタイムアウト、networkidle で再待機します: {e}")
+
+    try:
+        page.wait_for_load_state("networkidle", timeout=15000)
+    except PlaywrightError as e:
+        log_error(f"networkidle 待機もタイムアウトしました: {e}")
+
+
+# 2ページ目以降で読み込みを止めるリソース種別。
+# 画像は src 属性から URL を取れるので本体は不要。スタイルシートは
+# 表示判定 (is_visible / innerText) に影響するため止めない。
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font"})
+
+# 上記リソースの URL パターン。ルートをこれに絞り、それ以外のリクエストは
+# Python 側のハンドラを経由させない（文書・スクリプト・XHR を遅らせないため）
+BLOCKED_RESOURCE_URL_RE = re.compile(
+    r"\.(?:png|jpe?g|gif|webp|avif|svg|ico|bmp|woff2?|ttf|otf|eot|mp4|webm|mov|mp3|m4a|ogg|wav)(?:[?#]|$)",
+    re.IGNORECASE,
+)
+
+
+def _block_heavy_resources(context):
+    """ページネーション中の画像・メディア・フォントの読み込みを止める"""
+    def handle(route):
+        # 拡張子が一致しても文書や XHR として読まれるものは通す
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+            route.abort()
+        else:
+            route.continue_()
+
+    context.route(BLOCKED_RESOURCE_URL_RE, handle)
+
 
 # ────────────────────────────────────────────
 #  ページ分析・戦略生成
 # ────────────────────────────────────────────
 
+DEFAULT_IGNORE_SELECTORS = (
+    "nav", "footer", "header", ".sidebar", ".ad", ".advertisement",
+    ".cookie", ".popup", "[role=navigation]", "[role=banner]",
+)
+
+# メタデータで記事と判定したときの除外セレクタ。
+# 記事の見出しは <article><header><h1> に置かれることが多いため header は含めない
+FAST_PATH_IGNORE_SELECTORS = ("nav", "footer", "aside", ".ad")
+
+# 記事ページとみなす JSON-LD の @type
+ARTICLE_LD_TYPES = frozenset({"Article", "BlogPosting", "NewsArticle", "TechArticle", "Report"})
+
+
+def fast_path_strategy(page) -> dict | None:
+    """
+    og:type / JSON-LD の @type から記事ページと判定できる場合、DOM統計を
+    取らずに既定の記事戦略を返す。判定できなければ None を返す。
+    """
+    try:
+        hints = page.evaluate("""() => {
+            const og = document.querySelector('meta[property="og:type"]');
+            const ldTypes = [];
+            const collect = node => {
+                if (!node || typeof node !== 'object') return;
+                if (Array.isArray(node)) { node.forEach(collect); return; }
+                const t = node['@type'];
+                if (typeof t === 'string') ldTypes.push(t);
+                else if (Array.isArray(t)) ldTypes.push(...t);
+                if (node['@graph']) collect(node['@graph']);
+            };
+            document.querySelectorAll('script[type="application/ld+json"]').forEach(s => {
+                try { collect(JSON.parse(s.textContent)); } catch {}
+            });
+            return {
+                og_type: og ? (og.content || '').toLowerCase() : '',
+                ld_types: ldTypes,
+                article_count: document.getElementsByTagName('article').length,
+            };
+        }""")
+    except (RuntimeError, TimeoutError, PlaywrightError) as e:
+        log_error(f"メタデータによるページ種別判定エラー: {e}")
+        return None
+
+    is_article = hints["og_type"] == "article" or any(t in ARTICLE_LD_TYPES for t in hints["ld_types"])
+    if not is_article or hints["article_count"] != 1:
+        return None
+
+    log("戦略生成完了（メタデータ）: page_type=article, container=body")
+    return {
+        "page_type": "article",
+        "content_selectors": {
+            # フィールドはコンテナの子孫から探すため、article 自体を含む body を起点にする
+            "main_container": "body",
+            "title": "article h1",
+            "body": "p",
+            "author": None,
+            "date": "time",
+            "items": None,
+        },
+        "pagination": {
+            "next_selector": None,
+        },
+        "ignore_selectors": list(FAST_PATH_IGNORE_SELECTORS),
+        "extraction_fields": [
+            {"name": "title", "selector": "article h1"},
+            {"name": "content", "selector": "article"},
+            {"name": "date", "selector": "time", "attribute": "datetime"},
+        ],
+    }
+
+
 def get_page_summary(page, url: str) -> dict:
     """
     ページ構造のサマリーを生成する。
@@ -214,8 +491,7 @@ def generate_scraping_strategy(page_summary: dict) -> dict:
         "pagination": {
             "next_selector": next_selector,
         },
-        "ignore_selectors": ["nav", "footer", "header", ".sidebar", ".ad", ".advertisement",
-                             ".cookie", ".popup", "[role=navigation]", "[role=banner]"],
+        "ignore_selectors": list(DEFAULT_IGNORE_SELECTORS),
         "extraction_fields": [
             {"name": "title", "selector": "h1"},
             {"name": "content", "selector": main_container},
@@ -270,11 +546,8 @@ def extract_with_strategy(page, url: str, strategy: dict) -> dict:
         # フィールド定義のみで抽出
         extract_fields_global(page, extraction_fields, ignore_selectors, data)
 
-    # 画像
-    extract_images(page, url, ignore_selectors, data)
-
-    # リンク
-    extract_links(page, url, ignore_selectors, data)
+    # 画像・リンク
+    extract_images_and_links(page, url, ignore_selectors, data)
 
     content_count = len(data.get("content", []))
     if content_count == 0:
@@ -320,50 +593,65 @@ def extract_json_ld(page, data: dict):
 
 
 def extract_list_items(page, items_selector: str, fields: list, ignore: list, data: dict):
-    """リストページから各アイテムを抽出する（ブログ一覧等）"""
+    """
+    リストページから各アイテムを抽出する（ブログ一覧等）。
+    アイテム数×フィールド数の往復を避けるため、1回の evaluate で全アイテムを処理する。
+    """
+    valid_fields = [
+        {"name": f.get("name", ""), "selector": f.get("selector", ""), "attribute": f.get("attribute")}
+        for f in fields
+        if f.get("name") and f.get("selector")
+    ]
     try:
-        items = page.query_selector_all(items_selector)
-        log(f"アイテム数: {len(items)} (セレクタ: {items_selector})")
-
-        for i, item in enumerate(items):
-            # 無視セレクタに含まれる要素をスキップ
-            if should_ignore(item, ignore):
-                continue
-
-            item_data = {}
-            for field in fields:
-                name = field.get("name", "")
-                selector = field.get("selector", "")
-                attribute = field.get("attribute")
-
-                if not name or not selector:
-                    continue
-
-                try:
-                    el = item.query_selector(selector)
-                    if el:
-                        if attribute:
-                            value = el.get_attribute(attribute) or ""
-                        else:
-                            value = (el.inner_text() or "").strip()
-                        if value:
-                            item_data[name] = value
-                except (RuntimeError, TimeoutError):
-                    continue
+        result = page.evaluate("""(params) => {
+            const {itemsSel, fields, ignore} = params;
+            // 不正なセレクタは除外して結合する
+            const ignoreSel = ignore.filter(sel => {
+                try { document.querySelector(sel); return true; } catch { return false; }
+            }).join(', ');
+
+            // 無視セレクタの除外はセレクタエンジン側で行う。
+            // 組み立てたセレクタが解釈できない場合は closest() での除外にフォールバック
+            let items;
+            let needsClosest = false;
+            const ignoreClause = ignoreSel
+                ? `:not(:is(${ignoreSel})):not(:is(${ignoreSel}) *)`
+                : '';
+            try {
+                items = document.querySelectorAll(`:is(${itemsSel})${ignoreClause}`);
+            } catch {
+                items = document.querySelectorAll(itemsSel);
+                needsClosest = !!ignoreSel;
+            }
+            const extracted = [];
+            for (const item of items) {
+                if (needsClosest && item.closest(ignoreSel)) continue;
+
+                const itemData = {};
+                for (const f of fields) {
+                    let el;
+                    try { el = item.querySelector(f.selector); } catch { continue; }
+                    if (!el) continue;
+                    const value = f.attribute
+                        ? (el.getAttribute(f.attribute) || '')
+                        : (el.innerText || '').trim();
+                    if (value) itemData[f.name] = value;
+                }
 
-            # フィールドが取得できなかった場合、アイテム全体のテキストを取得
-            if not item_data:
-                try:
-                    text = (item.inner_text() or "").strip()
-                    if text and len(text) >= 3:
-                        item_data["text"] = text
-                except (RuntimeError, TimeoutError):
-                    continue
+                // フィールドが取得できなかった場合、アイテム全体のテキストを取得
+                if (Object.keys(itemData).length === 0) {
+                    const text = (item.innerText || '').trim();
+                    if (text.length >= 3) itemData.text = text;
+                }
 
-            if item_data:
-                data["content"].append(item_data)
+                if (Object.keys(itemData).length > 0) extracted.push(itemData);
+            }
+            return {total: items.length, items: extracted};
+        }""", {"itemsSel": items_selector, "fields": valid_fields, "ignore": ignore})
+        log(f"アイテム数: {result['total']} (セレクタ: {items_selector})")
+        data["content"].extend(result["items"])
 
-    except (RuntimeError, TimeoutError) as e:
+    except (RuntimeError, TimeoutError, PlaywrightError) as e:
         log_error(f"リストアイテム抽出エラー: {e}")
 
 
@@ -462,56 +750,44 @@ def should_ignore(element, ignore_selectors: list) -> bool:
     return False
 
 
-def extract_images(page, url: str, ignore: list, data: dict):
-    """画像を抽出する（無視セレクタを考慮）"""
-    ignore_css = ", ".join(ignore) if ignore else ""
-    try:
-        images = page.evaluate(f"""(params) => {{
-            const baseUrl = params.baseUrl;
-            const ignoreSelector = params.ignoreSelector;
-            const imgs = [];
-            const seen = new Set();
-            document.querySelectorAll('img[src]').forEach(img => {{
-                if (ignoreSelector && img.closest(ignoreSelector)) return;
-                let src = img.src;
-                if (!src || src.startsWith('data:')) return;
-                try {{ src = new URL(src, baseUrl).href; }} catch {{}}
-                if (seen.has(src)) return;
-                seen.add(src);
-                imgs.push({{src: src, alt: img.alt || ''}});
-            }});
-            return imgs;
-        }}""", {"baseUrl": url, "ignoreSelector": ignore_css})
-        data["images"] = images or []
-    except (RuntimeError, TimeoutError) as e:
-        log_error(f"画像抽出エラー: {e}")
-
-
-def extract_links(page, url: str, ignore: list, data: dict):
-    """リンクを抽出する（無視セレクタを考慮）"""
-    ignore_css = ", ".join(ignore) if ignore else ""
+def extract_images_and_links(page, url: str, ignore: list, data: dict):
+    """画像とリンクを1回の走査でまとめて抽出する（無視セレクタを考慮）"""
     try:
-        links = page.evaluate(f"""(params) => {{
-            const baseUrl = params.baseUrl;
-            const ignoreSelector = params.ignoreSelector;
-            const result = [];
-            const seen = new Set();
-            document.querySelectorAll('a[href]').forEach(a => {{
-                if (ignoreSelector && a.closest(ignoreSelector)) return;
-                let href = a.href;
-                if (!href || href.startsWith('#') || href.startsWith('javascript:')) return;
-                try {{ href = new URL(href, baseUrl).href; }} catch {{}}
-                const text = a.innerText?.trim();
-                if (!text) return;
-                if (seen.has(href)) return;
-                seen.add(href);
-                result.push({{href: href, text: text}});
-            }});
-            return result;
-        }}""", {"baseUrl": url, "ignoreSelector": ignore_css})
-        data["links"] = links or []
-    except (RuntimeError, TimeoutError) as e:
-        log_error(f"リンク抽出エラー: {e}")
+        result = page.evaluate("""(params) => {
+            const {baseUrl, ignore} = params;
+            const ignoreSel = ignore.filter(sel => {
+                try { document.querySelector(sel); return true; } catch { return false; }
+            }).join(', ');
+            const images = [];
+            const links = [];
+            const seenImages = new Set();
+            const seenLinks = new Set();
+            document.querySelectorAll('img[src], a[href]').forEach(el => {
+                if (ignoreSel && el.closest(ignoreSel)) return;
+                if (el.tagName === 'IMG') {
+                    let src = el.src;
+                    if (!src || src.startsWith('data:')) return;
+                    try { src = new URL(src, baseUrl).href; } catch {}
+                    if (seenImages.has(src)) return;
+                    seenImages.add(src);
+                    images.push({src: src, alt: el.alt || ''});
+                } else {
+                    let href = el.href;
+                    if (!href || href.startsWith('#') || href.startsWith('javascript:')) return;
+                    try { href = new URL(href, baseUrl).href; } catch {}
+                    const text = el.innerText?.trim();
+                    if (!text) return;
+                    if (seenLinks.has(href)) return;
+                    seenLinks.add(href);
+                    links.push({href: href, text: text});
+                }
+            });
+            return {images, links};
+        }""", {"baseUrl": url, "ignore": ignore})
+        data["images"] = result["images"] or []
+        data["links"] = result["links"] or []
+    except (RuntimeError, TimeoutError, PlaywrightError) as e:
+        log_error(f"画像・リンク抽出エラー: {e}")
 
 
 # ────────────────────────────────────────────
@@ -529,19 +805,38 @@ def find_next_page_with_strategy(page, current_url: str, strategy: dict) -> str
     parsed_current = urlparse(current_url)
 
     try:
-        el = page.query_selector(next_selector)
-        if el and el.is_visible():
-            href = el.get_attribute("href")
+        # 要素取得・表示判定・href 取得を1回の evaluate で行う
+        found = page.evaluate("""(sel) => {
+            const el = document.querySelector(sel);
+            if (!el) return null;
+            const r = el.getBoundingClientRect();
+            return {
+                href: el.getAttribute('href'),
+                visible: r.width > 0 && r.height > 0 && getComputedStyle(el).visibility !== 'hidden',
+            };
+        }""", next_selector)
+        if found and found["visible"]:
+            href = found["href"]
             if href and not href.startswith("#") and not href.startswith("javascript:"):
                 abs_url = urljoin(current_url, href)
                 if urlparse(abs_url).netloc == parsed_current.netloc:
                     return abs_url
-    except (RuntimeError, TimeoutError) as e:
+    except (RuntimeError, TimeoutError, PlaywrightError) as e:
         log_error(f"戦略ページネーション検出エラー: {e}")
 
     return None
 
 
+def _visited_key(url: str) -> bytes:
+    """
+    訪問済み判定用のキー。フラグメントと末尾の / は無視し、
+    ?page=2 のようなクエリでのページネーションを区別するためクエリは残す。
+    """
+    parts = urlsplit(url)
+    normalized = f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path.rstrip('/')}?{parts.query}"
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+
+
 # ────────────────────────────────────────────
 #  「続きを表示」/「もっと見る」ボタンのクリック
 # ────────────────────────────────────────────
@@ -737,6 +1032,58 @@ def dismiss_cookie_banners(page):
         log_error(f"Cookie バナー処理中にエラー: {e}")
 
 
+# ────────────────────────────────────────────
+#  JSON 出力
+# ────────────────────────────────────────────
+
+# これを超えるページ数の結果はインデントせず、ページ単位で書き出す
+STREAM_PAGES_THRESHOLD = 10
+
+
+def _dumps_bytes(obj, indent: bool = True) -> bytes:
+    """orjson があれば使い、なければ標準 json で UTF-8 バイト列にエンコードする"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+
+def _write_result_json(output_path: str, result: dict):
+    """
+    結果を JSON ファイルに書き出す。ページ数が多い場合は全体を一度に文字列化しない。
+    一時ファイルに書いてから置き換えるので、途中で中断されても壊れた JSON が残らない。
+    """
+    tmp_path = output_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            _write_result_to(f, result)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _write_result_to(f, result: dict):
+    pages = result.get("pages")
+    if not isinstance(pages, list) or len(pages) <= STREAM_PAGES_THRESHOLD:
+        f.write(_dumps_bytes(result))
+        return
+
+    header = {k: v for k, v in result.items() if k != "pages"}
+    f.write(_dumps_bytes(header, indent=False)[:-1])
+    f.write(b',"pages":[' if header else b'"pages":[')
+    for i, page_data in enumerate(pages):
+        if i:
+            f.write(b",")
+        f.write(_dumps_bytes(page_data, indent=False))
+    f.write(b"]}")
+
+
 # ────────────────────────────────────────────
 #  メイン
 # ────────────────────────────────────────────
@@ -763,26 +1110,31 @@ def main():
     if not check_playwright_browsers():
         install_playwright_browsers()
 
+    _disable_playwright_stack_inspection()
+
     # C#側タイムアウト(300秒)より余裕を持たせた制限（秒）
     SCRAPE_TIME_LIMIT = 240
 
     log("ブラウザを起動中...")
     with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
+        browser = _launch_browser(p)
         context = browser.new_context(
             user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
             viewport={"width": 1920, "height": 1080},
             locale="ja-JP",
+            service_workers="block",
         )
         page = context.new_page()
 
         try:
             all_pages = []
-            visited_urls = set()
+            visited_urls: set[bytes] = set()
             current_url = url
             page_num = 0
             max_pages = 100  # 安全上限
             strategy = None
+            # メタデータ由来の戦略は DOM 再分析で上書きしない
+            from_fast_path = False
             scrape_start = time.monotonic()
 
             def remaining_time() -> float:
@@ -794,20 +1146,23 @@ def main():
                     break
 
                 # 正規化して重複チェック
-                normalized = current_url.split("?")[0].split("#")[0].rstrip("/")
+                normalized = _visited_key(current_url)
                 if normalized in visited_urls:
                     log(f"既に訪問済みのURL、ページネーション終了: {current_url}")
                     break
                 visited_urls.add(normalized)
                 page_num += 1
+                if page_num == 2:
+                    _block_heavy_resources(context)
 
                 log(f"--- ページ {page_num} ---")
                 log(f"アクセス中: {current_url}")
                 try:
-                    page.goto(current_url, wait_until="domcontentloaded", timeout=60000)
-                except (RuntimeError, TimeoutError) as nav_error:
+                    page.goto(current_url, wait_until="domcontentloaded", timeout=30000)
+                except (RuntimeError, TimeoutError, PlaywrightTimeoutError) as nav_error:
                     log_error(f"ナビゲーション警告: {nav_error}")
                     log("ページの読み込みを続行します...")
+                _wait_for_page_ready(page, strategy)
                 log(f"読み込み完了: {page.title()}")
 
                 # Cookie バナーを閉じる（初回のみ）
@@ -818,8 +1173,11 @@ def main():
                 # DOM解析で戦略を生成（初回）
                 if strategy is None:
                     log("ページ構造を分析中...")
-                    page_summary = get_page_summary(page, current_url)
-                    strategy = generate_scraping_strategy(page_summary)
+                    strategy = fast_path_strategy(page)
+                    from_fast_path = strategy is not None
+                    if strategy is None:
+                        page_summary = get_page_summary(page, current_url)
+                        strategy = generate_scraping_strategy(page_summary)
 
                 # 動的コンテンツの段階的読み込み + 抽出ループ
                 round_num = 0
@@ -864,7 +1222,7 @@ def main():
                         break
 
                     # 次のラウンド前に戦略を再生成
-                    if remaining_time() > 60:
+                    if not from_fast_path and remaining_time() > 60:
                         log("ページ構造を再分析中...")
                         page_summary = get_page_summary(page, current_url)
                         try:
@@ -902,8 +1260,7 @@ def main():
             log(f"合計コンテンツ数: {total_content}")
 
             # JSON出力
-            with open(output_path, "w", encoding="utf-8") as f:
-                json.dump(result, f, ensure_ascii=False, indent=2)
+            _write_result_json(output_path, result)
             log(f"JSONファイルを出力しました: {output_path}")
 
         except Exception as e:
@@ -10,18 +10,44 @@ Usage:
 出力: JSON形式のページデータ（scrape_page.py と互換）
 """
 
+import codecs
+import hashlib
 import json
 import os
+import random
 import re
 
 import sys
+import threading
 import time
 import traceback
 from collections import Counter
-from urllib.parse import urljoin, urlparse
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from urllib.parse import urljoin, urlparse, urlsplit
 
 import requests
+import soupsieve
 from bs4 import BeautifulSoup, Tag
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# requests の依存として通常は入っている。無ければ文字コード推定をせず UTF-8 とみなす
+try:
+    import charset_normalizer
+except ImportError:
+    charset_normalizer = None
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
 
 
 def log(msg: str):
@@ -44,16 +70,106 @@ DEFAULT_HEADERS = {
     ),
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
     "Accept-Language": "ja,en-US;q=0.9,en;q=0.8",
-    "Accept-Encoding": "gzip, deflate, br",
+    "Accept-Encoding": "gzip, deflate",
+}
+
+# br はデコーダ (brotli / brotlicffi) がある場合だけ受け付ける
+try:
+    import brotli  # noqa: F401
+    DEFAULT_HEADERS["Accept-Encoding"] = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        DEFAULT_HEADERS["Accept-Encoding"] = "gzip, deflate, br"
+    except ImportError:
+        pass
+
+
+def _create_session(retries: int = 3) -> requests.Session:
+    """接続を使い回すためのセッション。一時的なエラーは retries 回まで自動でリトライする"""
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(
+            total=retries,
+            backoff_factor=0.3,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            raise_on_status=False,
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+SESSION = _create_session()
+
+
+# これを超える HTML は切り詰める
+MAX_HTML_BYTES = 5 * 1024 * 1024
+
+_HEADER_CHARSET_RE = re.compile(r"charset=[\"']?([\w.:-]+)", re.IGNORECASE)
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+charset=[\"']?\s*([\w.:-]+)", re.IGNORECASE)
+
+
+# Python の codecs が知らない、日本語サイトでよく使われる別名
+_ENCODING_ALIASES = {
+    "windows-31j": "cp932",
+    "x-sjis": "shift_jis",
+    "x-euc-jp": "euc_jp",
 }
 
 
-def fetch_html(url: str, timeout: int = 60) -> tuple[str, str]:
+def _usable_encoding(name: str | None) -> str | None:
+    """Python で扱えるエンコーディング名なら返す"""
+    if not name:
+        return None
+    name = _ENCODING_ALIASES.get(name.lower(), name)
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def _detect_encoding(content_type: str, body: bytes) -> str:
+    """
+    Content-Type の charset → meta charset → 文字コード推定 の順に決める。
+    推定は本文全体を走査して遅いため、宣言がない場合だけ先頭部分に対して行う。
+    """
+    m = _HEADER_CHARSET_RE.search(content_type)
+    encoding = _usable_encoding(m.group(1)) if m else None
+    if encoding:
+        return encoding
+
+    m = _META_CHARSET_RE.search(body[:4096])
+    encoding = _usable_encoding(m.group(1).decode("ascii", "ignore")) if m else None
+    if encoding:
+        return encoding
+
+    if charset_normalizer is None:
+        return "utf-8"
+    best = charset_normalizer.from_bytes(body[:65536]).best()
+    return _usable_encoding(best.encoding if best else None) or "utf-8"
+
+
+def fetch_html(url: str, timeout: float = 60, session: requests.Session | None = None) -> tuple[str, str]:
     """URLからHTMLを取得し、(html, final_url) を返す。"""
-    resp = requests.get(url, headers=DEFAULT_HEADERS, timeout=timeout, allow_redirects=True)
-    resp.raise_for_status()
-    resp.encoding = resp.apparent_encoding or "utf-8"
-    return resp.text, resp.url
+    with (session or SESSION).get(url, timeout=timeout, allow_redirects=True, stream=True) as resp:
+        resp.raise_for_status()
+        chunks = []
+        size = 0
+        for chunk in resp.iter_content(chunk_size=65536):
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= MAX_HTML_BYTES:
+                log(f"HTML が {MAX_HTML_BYTES // (1024 * 1024)}MB を超えたため切り詰めます")
+                break
+        body = b"".join(chunks)[:MAX_HTML_BYTES]
+        encoding = _detect_encoding(resp.headers.get("Content-Type", ""), body)
+        return body.decode(encoding, errors="replace"), resp.url
 
 
 # ────────────────────────────────────────────
@@ -76,31 +192,28 @@ def get_page_summary(soup: BeautifulSoup, url: str) -> dict:
     }
 
     # DOM統計
+    # タグ数・class頻度・id一覧を1回の走査でまとめて集計する
     try:
-        all_tags = soup.find_all(True)
-        tag_counts = Counter(tag.name for tag in all_tags)
-
-        # class名の出現頻度 Top 20
+        tag_counts: Counter[str] = Counter()
         class_counts: Counter[str] = Counter()
-        for tag in all_tags:
-            classes = tag.get("class", [])
+        ids = []
+        for tag in soup.descendants:
+            if not isinstance(tag, Tag):
+                continue
+            tag_counts[tag.name] += 1
+            classes = tag.get("class")
             if isinstance(classes, list):
-                for cls in classes:
-                    if 1 < len(cls) < 50:
-                        class_counts[cls] += 1
-        top_classes = [f"{cls}({count})" for cls, count in class_counts.most_common(20)]
+                class_counts.update(cls for cls in classes if 1 < len(cls) < 50)
+            if len(ids) < 20:
+                tag_id = tag.get("id", "")
+                if tag_id and len(tag_id) < 50:
+                    ids.append(tag_id)
 
-        # id一覧 Top 20
-        ids = []
-        for tag in all_tags:
-            tag_id = tag.get("id", "")
-            if tag_id and len(tag_id) < 50:
-                ids.append(tag_id)
-                if len(ids) >= 20:
-                    break
+        # class名の出現頻度 Top 20
+        top_classes = [f"{cls}({count})" for cls, count in class_counts.most_common(20)]
 
         summary["dom_stats"] = {
-            "total_elements": len(all_tags),
+            "total_elements": tag_counts.total(),
             "tag_counts": dict(tag_counts),
             "common_classes": top_classes,
             "ids": ids,
@@ -108,13 +221,25 @@ def get_page_summary(soup: BeautifulSoup, url: str) -> dict:
     except (AttributeError, TypeError, ValueError) as e:
         log_error(f"DOM統計取得エラー: {e}")
 
-    # HTMLサンプル（script/style除去、先頭4000文字）
+    # HTMLサンプル（script/style除去）
+    # 先頭4000文字だと <head> だけで埋まることが多いため、
+    # <head> 先頭1000文字 + <body> 直下の要素を少しずつ取る。
+    # 再パースを避けるため元のツリーから一時的に外し、文字列化後に戻す
+    # （JSON-LD 等は後段の抽出で使う）
     try:
-        clone = BeautifulSoup(str(soup), "html.parser")
-        for tag in clone.find_all(["script", "style", "noscript", "svg", "iframe"]):
-            tag.decompose()
-        html_str = str(clone)
-        summary["sample_html"] = html_str[:4000]
+        removed = []
+        try:
+            for tag in soup.find_all(["script", "style", "noscript", "svg", "iframe"]):
+                placeholder = soup.new_string("")
+                tag.replace_with(placeholder)
+                removed.append((placeholder, tag))
+            head_html = str(soup.head)[:1000] if soup.head else ""
+            body_children = soup.body.find_all(recursive=False, limit=6) if soup.body else []
+            body_html = "".join(str(child)[:500] for child in body_children)[:2500]
+            summary["sample_html"] = f"{head_html}\n<!-- body -->\n{body_html}"
+        finally:
+            for placeholder, tag in reversed(removed):
+                placeholder.replace_with(tag)
     except (AttributeError, TypeError, ValueError) as e:
         log_error(f"HTMLサンプル取得エラー: {e}")
 
@@ -134,6 +259,80 @@ def get_page_summary(soup: BeautifulSoup, url: str) -> dict:
 #  DOM解析ベースのスクレイピング戦略自動生成
 # ────────────────────────────────────────────
 
+DEFAULT_IGNORE_SELECTORS = (
+    "nav", "footer", "header", ".sidebar", ".ad", ".advertisement",
+    ".cookie", ".popup", "[role=navigation]", "[role=banner]",
+)
+
+# メタデータで記事と判定したときの除外セレクタ。
+# 記事の見出しは <article><header><h1> に置かれることが多いため header は含めない
+FAST_PATH_IGNORE_SELECTORS = ("nav", "footer", "aside", ".ad")
+
+# 記事ページとみなす JSON-LD の @type
+ARTICLE_LD_TYPES = frozenset({"Article", "BlogPosting", "NewsArticle", "TechArticle", "Report"})
+
+
+def _collect_ld_types(node, types: list):
+    """JSON-LD から @type を再帰的に集める（@graph 内も含む）"""
+    if isinstance(node, list):
+        for child in node:
+            _collect_ld_types(child, types)
+    elif isinstance(node, dict):
+        t = node.get("@type")
+        if isinstance(t, str):
+            types.append(t)
+        elif isinstance(t, list):
+            types.extend(x for x in t if isinstance(x, str))
+        if "@graph" in node:
+            _collect_ld_types(node["@graph"], types)
+
+
+def fast_path_strategy(soup: BeautifulSoup, url: str) -> dict | None:
+    """
+    og:type / JSON-LD の @type から記事ページと判定できる場合、DOM統計を
+    取らずに既定の記事戦略を返す。判定できなければ None を返す。
+    """
+    og = soup.find("meta", attrs={"property": "og:type"})
+    og_type = (og.get("content") or "").lower() if og else ""
+
+    ld_types = []
+    for ld_el in soup.find_all("script", {"type": "application/ld+json"}):
+        try:
+            if ld_el.string:
+                _collect_ld_types(_parse_json_ld(ld_el.string), ld_types)
+        except json.JSONDecodeError:
+            continue
+
+    is_article = og_type == "article" or any(t in ARTICLE_LD_TYPES for t in ld_types)
+    if not is_article or len(soup.find_all("article", limit=2)) != 1:
+        return None
+
+    log(f"戦略生成完了（メタデータ）: page_type=article, container=body ({url})")
+    return {
+        "page_type": "article",
+        "content_selectors": {
+            # フィールドはコンテナの子孫から探すため、article 自体を含む body を起点にする
+            "main_container": "body",
+            "title": "article h1",
+            "body": "p",
+            "author": "[itemprop=author]",
+            "date": "time",
+            "items": None,
+        },
+        "pagination": {
+            "next_selector": None,
+        },
+        "ignore_selectors": list(FAST_PATH_IGNORE_SELECTORS),
+        # schema.org のプロパティに対応する要素: headline, articleBody, datePublished, author
+        "extraction_fields": [
+            {"name": "title", "selector": "article h1"},
+            {"name": "content", "selector": "article"},
+            {"name": "date", "selector": "time", "attribute": "datetime"},
+            {"name": "author", "selector": "[itemprop=author]"},
+        ],
+    }
+
+
 def generate_scraping_strategy(page_summary: dict) -> dict:
     """ページのDOM構造を解析し、ヒューリスティックでスクレイピング戦略を生成する。"""
     dom_stats = page_summary.get("dom_stats", {})
@@ -206,8 +405,7 @@ def generate_scraping_strategy(page_summary: dict) -> dict:
         "pagination": {
             "next_selector": next_selector,
         },
-        "ignore_selectors": ["nav", "footer", "header", ".sidebar", ".ad", ".advertisement",
-                             ".cookie", ".popup", "[role=navigation]", "[role=banner]"],
+        "ignore_selectors": list(DEFAULT_IGNORE_SELECTORS),
         "extraction_fields": [
             {"name": "title", "selector": "h1"},
             {"name": "content", "selector": main_container},
@@ -223,34 +421,89 @@ def generate_scraping_strategy(page_summary: dict) -> dict:
 #  戦略ベースのデータ抽出（BeautifulSoup版）
 # ────────────────────────────────────────────
 
-def should_ignore(element: Tag, ignore_selectors: list) -> bool:
-    """要素が無視セレクタに含まれるかチェックする"""
+def compile_strategy_selectors(strategy: dict) -> dict:
+    """
+    戦略に含まれる CSS セレクタをまとめてコンパイルする。
+    ページごと・要素ごとの再パースを避けるため、戦略が変わらない限り使い回す。
+    解釈できないセレクタは None として登録し、抽出時は空扱いにする。
+    """
+    selectors = set(strategy.get("ignore_selectors", []))
+    selectors.update(v for v in strategy.get("content_selectors", {}).values() if v)
+    selectors.update(f.get("selector") for f in strategy.get("extraction_fields", []) if f.get("selector"))
+    next_selector = strategy.get("pagination", {}).get("next_selector")
+    if next_selector:
+        selectors.add(next_selector)
+
+    compiled = {}
+    for sel in selectors:
+        try:
+            compiled[sel] = soupsieve.compile(sel)
+        except (soupsieve.SelectorSyntaxError, TypeError, ValueError) as e:
+            log_error(f"セレクタを解釈できません: {sel} ({e})")
+            compiled[sel] = None
+    return compiled
+
+
+def _select(root: Tag, selector: str, compiled: dict | None) -> list:
+    """コンパイル済みセレクタがあればそれを使って select する"""
+    if compiled is not None and selector in compiled:
+        cs = compiled[selector]
+        return cs.select(root) if cs else []
+    return root.select(selector)
+
+
+def _select_one(root: Tag, selector: str, compiled: dict | None) -> Tag | None:
+    """コンパイル済みセレクタがあればそれを使って select_one する"""
+    if compiled is not None and selector in compiled:
+        cs = compiled[selector]
+        return cs.select_one(root) if cs else None
+    return root.select_one(selector)
+
+
+def collect_ignored_nodes(soup: BeautifulSoup, ignore_selectors: list, selectors: dict | None = None) -> set:
+    """
+    無視セレクタにマッチする要素とその子孫の id() を集める。
+    ページごとに1回だけ計算し、should_ignore は集合の参照だけで判定する。
+    """
+    ignored = set()
     for selector in ignore_selectors:
         try:
-            # 要素自身またはその祖先が無視セレクタにマッチするかチェック
-            for parent in [element] + list(element.parents):
-                if isinstance(parent, Tag):
-                    try:
-                        if parent.select_one(selector) is parent or parent.name == selector:
-                            return True
-                    except (NotImplementedError, ValueError, AttributeError):
-                        pass
-                    # セレクタに直接マッチするかチェック
-                    try:
-                        matches = parent.parent.select(selector) if parent.parent else []
-                        if parent in matches:
-                            return True
-                    except (NotImplementedError, ValueError, AttributeError):
-                        pass
-        except (AttributeError, TypeError):
+            matches = _select(soup, selector, selectors)
+        except (soupsieve.SelectorSyntaxError, NotImplementedError, ValueError, AttributeError):
             continue
-    return False
+        for match in matches:
+            if id(match) in ignored:
+                continue
+            ignored.add(id(match))
+            ignored.update(id(d) for d in match.descendants if isinstance(d, Tag))
+    return ignored
 
 
-def extract_metadata(soup: BeautifulSoup, data: dict):
+def should_ignore(element: Tag, ignored: set) -> bool:
+    """要素が無視セレクタに含まれるかチェックする"""
+    return id(element) in ignored
+
+
+# extract_with_strategy で1回の走査でまとめて集める要素
+INDEXED_TAGS = ("meta", "script", "img", "a")
+
+
+def index_tags(soup: BeautifulSoup) -> dict[str, list[Tag]]:
+    """
+    メタデータ・JSON-LD・画像・リンク抽出で使う要素を1回の走査で集める。
+    抽出関数ごとに find_all でツリー全体を辿るのを避けるため。
+    """
+    index: dict[str, list[Tag]] = {name: [] for name in INDEXED_TAGS}
+    for tag in soup.find_all(INDEXED_TAGS):
+        index[tag.name].append(tag)
+    return index
+
+
+def extract_metadata(soup: BeautifulSoup, data: dict, tags: dict | None = None):
     """メタタグを抽出する"""
     try:
-        for m in soup.find_all("meta"):
+        metas = tags["meta"] if tags is not None else soup.find_all("meta")
+        for m in metas:
             name = m.get("name") or m.get("property") or ""
             content = m.get("content", "")
             if name and content:
@@ -259,16 +512,46 @@ def extract_metadata(soup: BeautifulSoup, data: dict):
         log_error(f"メタデータ抽出エラー: {e}")
 
 
-def extract_json_ld(soup: BeautifulSoup, data: dict):
+_JSON_DECODER = json.JSONDecoder()
+_JSON_START_RE = re.compile(r"[{\[]")
+
+
+def _parse_json_ld(text: str):
+    """
+    JSON-LD のテキストをパースする。
+    <!-- --> や CDATA で囲まれていたり末尾に ; があるものも多いため、
+    { / [ の位置から raw_decode で JSON 値1つ分だけを読み、失敗したら次の候補へ進む。
+    大半はそのままパースできるので、orjson があれば先に全体を試す。
+    """
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+
+    last_error = json.JSONDecodeError("JSON の開始位置が見つかりません", text, 0)
+    for m in _JSON_START_RE.finditer(text):
+        try:
+            obj, _ = _JSON_DECODER.raw_decode(text, m.start())
+            return obj
+        except json.JSONDecodeError as e:
+            last_error = e
+    raise last_error
+
+
+def extract_json_ld(soup: BeautifulSoup, data: dict, tags: dict | None = None):
     """JSON-LD 構造化データを抽出する"""
     try:
-        ld_elements = soup.find_all("script", {"type": "application/ld+json"})
+        if tags is not None:
+            ld_elements = [el for el in tags["script"] if el.get("type") == "application/ld+json"]
+        else:
+            ld_elements = soup.find_all("script", {"type": "application/ld+json"})
         ld_list = []
         for ld_el in ld_elements:
             try:
                 ld_text = ld_el.string
                 if ld_text:
-                    ld_list.append(json.loads(ld_text))
+                    ld_list.append(_parse_json_ld(ld_text))
             except (json.JSONDecodeError, AttributeError) as e:
                 log_error(f"JSON-LD 解析エラー: {e}")
         if len(ld_list) == 1:
@@ -279,21 +562,37 @@ def extract_json_ld(soup: BeautifulSoup, data: dict):
         log_error(f"JSON-LD 抽出エラー: {e}")
 
 
-def _get_element_value(el: Tag, attribute: str | None) -> str:
+def _get_text(el: Tag, text_cache: dict | None) -> str:
+    """
+    要素のテキストを取得する。
+    同じ要素を複数のフィールドやリンク抽出で参照するため、ページ単位でキャッシュする。
+    """
+    if text_cache is None:
+        return el.get_text(strip=True)
+    key = id(el)
+    text = text_cache.get(key)
+    if text is None:
+        text = el.get_text(strip=True)
+        text_cache[key] = text
+    return text
+
+
+def _get_element_value(el: Tag, attribute: str | None, text_cache: dict | None = None) -> str:
     """要素から値を取得する"""
     if attribute:
         return el.get(attribute, "") or ""
-    return el.get_text(strip=True)
+    return _get_text(el, text_cache)
 
 
-def extract_list_items(soup: BeautifulSoup, items_selector: str, fields: list, ignore: list, data: dict):
+def extract_list_items(soup: BeautifulSoup, items_selector: str, fields: list, ignored: set, data: dict,
+                       selectors: dict | None = None, text_cache: dict | None = None):
     """リストページから各アイテムを抽出する"""
     try:
-        items = soup.select(items_selector)
+        items = _select(soup, items_selector, selectors)
         log(f"アイテム数: {len(items)} (セレクタ: {items_selector})")
 
         for item in items:
-            if should_ignore(item, ignore):
+            if should_ignore(item, ignored):
                 continue
 
             item_data = {}
@@ -306,9 +605,9 @@ def extract_list_items(soup: BeautifulSoup, items_selector: str, fields: list, i
                     continue
 
                 try:
-                    el = item.select_one(selector)
+                    el = _select_one(item, selector, selectors)
                     if el:
-                        value = _get_element_value(el, attribute)
+                        value = _get_element_value(el, attribute, text_cache)
                         if value:
                             item_data[name] = value
                 except (AttributeError, TypeError, ValueError):
@@ -317,7 +616,7 @@ def extract_list_items(soup: BeautifulSoup, items_selector: str, fields: list, i
             # フィールドが取得できなかった場合、アイテム全体のテキストを取得
             if not item_data:
                 try:
-                    text = item.get_text(strip=True)
+                    text = _get_text(item, text_cache)
                     if text and len(text) >= 3:
                         item_data["text"] = text
                 except (AttributeError, TypeError):
@@ -330,13 +629,14 @@ def extract_list_items(soup: BeautifulSoup, items_selector: str, fields: list, i
         log_error(f"リストアイテム抽出エラー: {e}")
 
 
-def extract_from_container(soup: BeautifulSoup, container_selector: str, fields: list, ignore: list, data: dict):
+def extract_from_container(soup: BeautifulSoup, container_selector: str, fields: list, ignored: set, data: dict,
+                           selectors: dict | None = None, text_cache: dict | None = None):
     """メインコンテナからフィールドを抽出する"""
     try:
-        container = soup.select_one(container_selector)
+        container = _select_one(soup, container_selector, selectors)
         if not container:
             log(f"メインコンテナが見つかりません: {container_selector}")
-            extract_fields_global(soup, fields, ignore, data)
+            extract_fields_global(soup, fields, ignored, data, selectors, text_cache)
             return
 
         content_item = {}
@@ -349,9 +649,9 @@ def extract_from_container(soup: BeautifulSoup, container_selector: str, fields:
                 continue
 
             try:
-                el = container.select_one(selector)
-                if el and not should_ignore(el, ignore):
-                    value = _get_element_value(el, attribute)
+                el = _select_one(container, selector, selectors)
+                if el and not should_ignore(el, ignored):
+                    value = _get_element_value(el, attribute, text_cache)
                     if value:
                         content_item[name] = value
             except (AttributeError, TypeError, ValueError):
@@ -362,7 +662,7 @@ def extract_from_container(soup: BeautifulSoup, container_selector: str, fields:
         else:
             # フィールド抽出に失敗した場合、コンテナ全体のテキストを取得
             try:
-                text = container.get_text(strip=True)
+                text = _get_text(container, text_cache)
                 if text:
                     data["content"].append({"text": text})
             except (AttributeError, TypeError):
@@ -372,7 +672,8 @@ def extract_from_container(soup: BeautifulSoup, container_selector: str, fields:
         log_error(f"コンテナ抽出エラー: {e}")
 
 
-def extract_fields_global(soup: BeautifulSoup, fields: list, ignore: list, data: dict):
+def extract_fields_global(soup: BeautifulSoup, fields: list, ignored: set, data: dict,
+                          selectors: dict | None = None, text_cache: dict | None = None):
     """ページ全体からフィールドを抽出する"""
     content_item = {}
     for field in fields:
@@ -384,12 +685,12 @@ def extract_fields_global(soup: BeautifulSoup, fields: list, ignore: list, data:
             continue
 
         try:
-            elements = soup.select(selector)
+            elements = _select(soup, selector, selectors)
             values = []
             for el in elements:
-                if should_ignore(el, ignore):
+                if should_ignore(el, ignored):
                     continue
-                v = _get_element_value(el, attribute)
+                v = _get_element_value(el, attribute, text_cache)
                 if v:
                     values.append(v)
 
@@ -404,18 +705,33 @@ def extract_fields_global(soup: BeautifulSoup, fields: list, ignore: list, data:
         data["content"].append(content_item)
 
 
-def extract_images(soup: BeautifulSoup, url: str, ignore: list, data: dict):
+def _absolute_url(base_url: str, href: str, cache: dict) -> str:
+    """
+    相対 URL を絶対 URL にする。既に絶対 URL ならそのまま返し、
+    同じ相対パス（ギャラリーの /static/... 等）の urljoin は使い回す。
+    """
+    if href.startswith(("http://", "https://")):
+        return href
+    abs_url = cache.get(href)
+    if abs_url is None:
+        abs_url = cache[href] = urljoin(base_url, href)
+    return abs_url
+
+
+def extract_images(soup: BeautifulSoup, url: str, ignored: set, data: dict, tags: dict | None = None):
     """画像を抽出する"""
     try:
         imgs = []
         seen = set()
-        for img in soup.find_all("img", src=True):
-            if should_ignore(img, ignore):
+        join_cache: dict[str, str] = {}
+        candidates = tags["img"] if tags is not None else soup.find_all("img", src=True)
+        for img in candidates:
+            if should_ignore(img, ignored):
                 continue
             src = img.get("src", "")
             if not src or src.startswith("data:"):
                 continue
-            src = urljoin(url, src)
+            src = _absolute_url(url, src, join_cache)
             if src in seen:
                 continue
             seen.add(src)
@@ -425,23 +741,27 @@ def extract_images(soup: BeautifulSoup, url: str, ignore: list, data: dict):
         log_error(f"画像抽出エラー: {e}")
 
 
-def extract_links(soup: BeautifulSoup, url: str, ignore: list, data: dict):
+def extract_links(soup: BeautifulSoup, url: str, ignored: set, data: dict, text_cache: dict | None = None,
+                  tags: dict | None = None):
     """リンクを抽出する"""
     try:
         links = []
         seen = set()
-        for a in soup.find_all("a", href=True):
-            if should_ignore(a, ignore):
+        join_cache: dict[str, str] = {}
+        candidates = tags["a"] if tags is not None else soup.find_all("a", href=True)
+        for a in candidates:
+            if should_ignore(a, ignored):
                 continue
             href = a.get("href", "")
             if not href or href.startswith("#") or href.startswith("javascript:"):
                 continue
-            href = urljoin(url, href)
-            text = a.get_text(strip=True)
-            if not text:
-                continue
+            href = _absolute_url(url, href, join_cache)
+            # テキスト取得より先に重複を判定する
             if href in seen:
                 continue
+            text = _get_text(a, text_cache)
+            if not text:
+                continue
             seen.add(href)
             links.append({"href": href, "text": text})
         data["links"] = links
@@ -449,8 +769,13 @@ def extract_links(soup: BeautifulSoup, url: str, ignore: list, data: dict):
         log_error(f"リンク抽出エラー: {e}")
 
 
-def extract_with_strategy(soup: BeautifulSoup, url: str, strategy: dict) -> dict:
-    """戦略に基づいてページデータを抽出する。"""
+def extract_with_strategy(soup: BeautifulSoup, url: str, strategy: dict, selectors: dict | None = None) -> dict:
+    """
+    戦略に基づいてページデータを抽出する。
+    selectors には compile_strategy_selectors の結果を渡す（省略時はここでコンパイルする）。
+    """
+    if selectors is None:
+        selectors = compile_strategy_selectors(strategy)
     title = soup.title.string.strip() if soup.title and soup.title.string else ""
 
     data = {
@@ -464,32 +789,34 @@ def extract_with_strategy(soup: BeautifulSoup, url: str, strategy: dict) -> dict
         "links": [],
     }
 
-    ignore_selectors = strategy.get("ignore_selectors", [])
+    ignored = collect_ignored_nodes(soup, strategy.get("ignore_selectors", []), selectors)
+    text_cache: dict[int, str] = {}
     content_selectors = strategy.get("content_selectors", {})
     extraction_fields = strategy.get("extraction_fields", [])
 
     # メタデータ
-    extract_metadata(soup, data)
+    tags = index_tags(soup)
+    extract_metadata(soup, data, tags)
 
     # JSON-LD
-    extract_json_ld(soup, data)
+    extract_json_ld(soup, data, tags)
 
     # 戦略ベースのコンテンツ抽出
     items_selector = content_selectors.get("items")
     main_container = content_selectors.get("main_container")
 
     if items_selector:
-        extract_list_items(soup, items_selector, extraction_fields, ignore_selectors, data)
+        extract_list_items(soup, items_selector, extraction_fields, ignored, data, selectors, text_cache)
     elif main_container:
-        extract_from_container(soup, main_container, extraction_fields, ignore_selectors, data)
+        extract_from_container(soup, main_container, extraction_fields, ignored, data, selectors, text_cache)
     else:
-        extract_fields_global(soup, extraction_fields, ignore_selectors, data)
+        extract_fields_global(soup, extraction_fields, ignored, data, selectors, text_cache)
 
     # 画像
-    extract_images(soup, url, ignore_selectors, data)
+    extract_images(soup, url, ignored, data, tags)
 
     # リンク
-    extract_links(soup, url, ignore_selectors, data)
+    extract_links(soup, url, ignored, data, text_cache, tags)
 
     content_count = len(data.get("content", []))
     if content_count == 0:
@@ -505,7 +832,20 @@ def extract_with_strategy(soup: BeautifulSoup, url: str, strategy: dict) -> dict
 #  ページネーション
 # ────────────────────────────────────────────
 
-def find_next_page_with_strategy(soup: BeautifulSoup, current_url: str, strategy: dict) -> str | None:
+def _same_host(abs_url: str, host: str) -> bool:
+    """abs_url のホストが host と一致するか。多くの場合は前方一致だけで判定できる"""
+    for scheme in ("https://", "http://"):
+        prefix = scheme + host
+        if abs_url.startswith(prefix):
+            rest = abs_url[len(prefix):]
+            # host.example.com のような別ホストを除外する
+            if not rest or rest[0] in "/?#":
+                return True
+    return urlparse(abs_url).netloc == host
+
+
+def find_next_page_with_strategy(soup: BeautifulSoup, current_url: str, strategy: dict,
+                                 selectors: dict | None = None) -> str | None:
     """戦略で指定されたセレクタを使ってページネーションリンクを検出する"""
     pagination = strategy.get("pagination", {})
     next_selector = pagination.get("next_selector")
@@ -513,15 +853,13 @@ def find_next_page_with_strategy(soup: BeautifulSoup, current_url: str, strategy
     if not next_selector:
         return None
 
-    parsed_current = urlparse(current_url)
-
     try:
-        el = soup.select_one(next_selector)
+        el = _select_one(soup, next_selector, selectors)
         if el:
             href = el.get("href", "")
             if href and not href.startswith("#") and not href.startswith("javascript:"):
                 abs_url = urljoin(current_url, href)
-                if urlparse(abs_url).netloc == parsed_current.netloc:
+                if _same_host(abs_url, urlparse(current_url).netloc):
                     return abs_url
     except (AttributeError, TypeError, ValueError) as e:
         log_error(f"戦略ページネーション検出エラー: {e}")
@@ -529,10 +867,196 @@ def find_next_page_with_strategy(soup: BeautifulSoup, current_url: str, strategy
     return None
 
 
+# ────────────────────────────────────────────
+#  ページネーションの先読み
+# ────────────────────────────────────────────
+
+PREFETCH_WORKERS = 5
+PREFETCH_LOOKAHEAD = 5
+PER_HOST_CONCURRENCY = 3
+# 先読みは投機的なので、短いタイムアウトでリトライもしない。
+# 実行中のスレッドは終了時に待たれるため、ここで待ち時間の上限が決まる
+PREFETCH_TIMEOUT = 10
+# 残り時間がこれを切ったら先読みしない（メインループは残り 30 秒で終了する）
+PREFETCH_MIN_REMAINING = 30 + PREFETCH_TIMEOUT * 2
+
+_NUMBER_RE = re.compile(r"\d+")
+
+
+def infer_page_url_pattern(prev_url: str, next_url: str) -> tuple[str, int, str] | None:
+    """
+    連続する2ページの URL がページ番号の数字1箇所だけ異なり、番号が1増えている場合、
+    (前半, next_url のページ番号, 後半) を返す。推定できなければ None。
+    """
+    prev_nums = list(_NUMBER_RE.finditer(prev_url))
+    next_nums = list(_NUMBER_RE.finditer(next_url))
+    if len(prev_nums) != len(next_nums):
+        return None
+
+    changed = [(a, b) for a, b in zip(prev_nums, next_nums) if a.group() != b.group()]
+    if len(changed) != 1:
+        return None
+    a, b = changed[0]
+    if int(b.group()) != int(a.group()) + 1:
+        return None
+    if prev_url[:a.start()] != next_url[:b.start()] or prev_url[a.end():] != next_url[b.end():]:
+        return None
+    return next_url[:b.start()], int(b.group()), next_url[b.end():]
+
+
+class PagePrefetcher:
+    """
+    ページ番号付き URL のパターンが分かった後、後続ページを並列に先読みする。
+    先読み結果は、実際に検出した次ページ URL と一致した場合だけ使う。
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS)
+        self._futures: dict[str, Future] = {}
+        self._host_semaphores: dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+        self._pattern: tuple[str, int, str] | None = None
+        self._session = _create_session(retries=0)
+
+    def _host_semaphore(self, url: str) -> threading.Semaphore:
+        host = urlparse(url).netloc
+        with self._lock:
+            sem = self._host_semaphores.get(host)
+            if sem is None:
+                sem = self._host_semaphores[host] = threading.Semaphore(PER_HOST_CONCURRENCY)
+            return sem
+
+    def _fetch(self, url: str) -> tuple[str, str]:
+        # 同一ホストへの同時接続数を抑え、間隔も少し空ける
+        with self._host_semaphore(url):
+            time.sleep(random.uniform(0.1, 0.5))
+            return fetch_html(url, timeout=PREFETCH_TIMEOUT, session=self._session)
+
+    def update(self, current_url: str, next_url: str, remaining_pages: int,
+               remaining_seconds: float, empty_streak: int):
+        """
+        検出した次ページ URL からパターンを更新し、先読みを投入する。
+        残り時間が少ない場合や、抽出件数の少ないページが出てクロールが止まりそうな場合は先読みしない。
+        """
+        pattern = infer_page_url_pattern(current_url, next_url)
+        if pattern is None:
+            if self._pattern is not None:
+                log("ページ URL のパターンが変わったため先読みを中止します")
+                self.cancel()
+            return
+
+        prefix, number, suffix = pattern
+        if self._pattern is None:
+            log(f"ページ URL のパターンを検出、先読みを開始します: {prefix}{{n}}{suffix}")
+        self._pattern = pattern
+
+        lookahead = min(PREFETCH_LOOKAHEAD, remaining_pages - 1)
+        if remaining_seconds <= PREFETCH_MIN_REMAINING or empty_streak > 0:
+            lookahead = 0
+
+        # next_url 自体は呼び出し側がすぐ取得するので、その次のページから先読みする
+        targets = [f"{prefix}{n}{suffix}" for n in range(number + 1, number + 1 + lookahead)]
+        for target, future in list(self._futures.items()):
+            if target != next_url and target not in targets:
+                future.cancel()
+                del self._futures[target]
+        for target in targets:
+            if target not in self._futures:
+                self._futures[target] = self._executor.submit(self._fetch, target)
+
+    def fetch(self, url: str, timeout: float) -> tuple[str, str]:
+        """
+        先読み済みならその結果を、なければその場で取得して返す。
+        先読みの完了待ちも含めて timeout 秒を超えないようにする。
+        """
+        future = self._futures.pop(url, None)
+        if future is not None and not future.cancelled():
+            try:
+                return future.result(timeout=max(timeout, 0))
+            except FuturesTimeoutError:
+                future.cancel()
+                raise requests.Timeout(f"先読みの完了待ちがタイムアウトしました: {url}") from None
+            except (requests.RequestException, OSError) as e:
+                log(f"先読みに失敗したため取得し直します: {e}")
+        with self._host_semaphore(url):
+            return fetch_html(url, timeout=max(1, min(60, timeout)))
+
+    def cancel(self):
+        self._pattern = None
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ────────────────────────────────────────────
+#  JSON 出力
+# ────────────────────────────────────────────
+
+# これを超えるページ数の結果はインデントせず、ページ単位で書き出す
+STREAM_PAGES_THRESHOLD = 10
+
+
+def _dumps_bytes(obj, indent: bool = True) -> bytes:
+    """orjson があれば使い、なければ標準 json で UTF-8 バイト列にエンコードする"""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode("utf-8")
+
+
+def _write_result_json(output_path: str, result: dict):
+    """
+    結果を JSON ファイルに書き出す。ページ数が多い場合は全体を一度に文字列化しない。
+    一時ファイルに書いてから置き換えるので、途中で中断されても壊れた JSON が残らない。
+    """
+    tmp_path = output_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            _write_result_to(f, result)
+        os.replace(tmp_path, output_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _write_result_to(f, result: dict):
+    pages = result.get("pages")
+    if not isinstance(pages, list) or len(pages) <= STREAM_PAGES_THRESHOLD:
+        f.write(_dumps_bytes(result))
+        return
+
+    header = {k: v for k, v in result.items() if k != "pages"}
+    f.write(_dumps_bytes(header, indent=False)[:-1])
+    f.write(b',"pages":[' if header else b'"pages":[')
+    for i, page_data in enumerate(pages):
+        if i:
+            f.write(b",")
+        f.write(_dumps_bytes(page_data, indent=False))
+    f.write(b"]}")
+
+
 # ────────────────────────────────────────────
 #  メイン
 # ────────────────────────────────────────────
 
+def _visited_key(url: str) -> bytes:
+    """
+    訪問済み判定用のキー。フラグメントと末尾の / は無視し、
+    ?page=2 のようなクエリでのページネーションを区別するためクエリは残す。
+    """
+    parts = urlsplit(url)
+    normalized = f"{parts.scheme.lower()}://{parts.netloc.lower()}{parts.path.rstrip('/')}?{parts.query}"
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=8).digest()
+
+
 def main():
     if len(sys.argv) < 3:
         log("Usage: scrape_page_http.py <url> <output_path>")
@@ -549,13 +1073,16 @@ def main():
     # C#側タイムアウト(300秒)より余裕を持たせた制限（秒）
     SCRAPE_TIME_LIMIT = 240
 
+    prefetcher = PagePrefetcher()
     try:
         all_pages = []
-        visited_urls = set()
+        visited_urls: set[bytes] = set()
         current_url = url
         page_num = 0
         max_pages = 100
         strategy = None
+        selectors = None
+        empty_streak = 0
         scrape_start = time.monotonic()
 
         def remaining_time() -> float:
@@ -567,7 +1094,7 @@ def main():
                 break
 
             # 正規化して重複チェック
-            normalized = current_url.split("?")[0].split("#")[0].rstrip("/")
+            normalized = _visited_key(current_url)
             if normalized in visited_urls:
                 log(f"既に訪問済みのURL、ページネーション終了: {current_url}")
                 break
@@ -578,7 +1105,7 @@ def main():
             log(f"HTTP でアクセス中: {current_url}")
 
             try:
-                html, final_url = fetch_html(current_url)
+                html, final_url = prefetcher.fetch(current_url, remaining_time())
             except (requests.RequestException, OSError) as e:
                 log_error(f"HTTP 取得エラー: {e}")
                 if page_num == 1:
@@ -587,18 +1114,21 @@ def main():
                 break
 
             log(f"HTML 取得完了 ({len(html)} bytes)")
-            soup = BeautifulSoup(html, "html.parser")
+            soup = BeautifulSoup(html, HTML_PARSER)
             log(f"ページタイトル: {soup.title.string.strip() if soup.title and soup.title.string else '(なし)'}")
 
             # DOM解析で戦略を生成（初回）
             if strategy is None:
                 log("ページ構造を分析中...")
-                page_summary = get_page_summary(soup, final_url)
-                strategy = generate_scraping_strategy(page_summary)
+                strategy = fast_path_strategy(soup, final_url)
+                if strategy is None:
+                    page_summary = get_page_summary(soup, final_url)
+                    strategy = generate_scraping_strategy(page_summary)
+                selectors = compile_strategy_selectors(strategy)
 
             # 戦略ベースでデータ抽出
             try:
-                page_data = extract_with_strategy(soup, final_url, strategy)
+                page_data = extract_with_strategy(soup, final_url, strategy, selectors)
             except RuntimeError as e:
                 if page_num == 1:
                     raise
@@ -612,9 +1142,21 @@ def main():
             all_pages.append(page_data)
 
             # ページネーション
-            next_url = find_next_page_with_strategy(soup, final_url, strategy)
+            next_url = find_next_page_with_strategy(soup, final_url, strategy, selectors)
+
+            # 一覧ページで抽出件数の少ないページが続く場合は、空のページを取り続けないよう終了する。
+            # 戦略生成は決定的なので、同じ DOM から作り直しても同じ戦略になり効果がない
+            if strategy.get("page_type") == "blog_listing" and content_count < 2:
+                empty_streak += 1
+            else:
+                empty_streak = 0
+            if empty_streak >= 2:
+                log("抽出件数の少ないページが続くため、ページネーションを終了します")
+                break
+
             if next_url and next_url != current_url:
                 log(f"次のページを検出: {next_url}")
+                prefetcher.update(current_url, next_url, max_pages - page_num, remaining_time(), empty_streak)
                 current_url = next_url
             else:
                 log("次のページが見つからないため、ページネーション終了")
@@ -641,14 +1183,15 @@ def main():
         log(f"合計コンテンツ数: {total_content}")
 
         # JSON出力
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(result, f, ensure_ascii=False, indent=2)
+        _write_result_json(output_path, result)
         log(f"JSONファイルを出力しました: {output_path}")
 
     except Exception as e:
         log_error(f"スクレイピングエラー: {type(e).__name__}: {e}")
         log_error(traceback.format_exc())
         sys.exit(1)
+    finally:
+        prefetcher.shutdown()
 
 
 if __name__ == "__main__":
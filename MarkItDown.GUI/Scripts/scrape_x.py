@@ -17,16 +17,35 @@ Usage:
     3: セッション切れ（再ログインが必要）
 """
 
+import asyncio
+import importlib.util
+import json
 import os
 import random
 import re
 import sys
 import tempfile
+import threading
 import time
 import traceback
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from urllib.parse import quote, urlparse, parse_qs, urlencode
+from urllib.parse import quote
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from playwright.sync_api import sync_playwright
+    from playwright.sync_api import Error as PlaywrightError
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+except ImportError:
+    sync_playwright = None
+    PlaywrightError = RuntimeError
+    PlaywrightTimeoutError = TimeoutError
 
 # リトライ回数の定数
 MAX_RELOAD_ATTEMPTS = 5  # 再検索後のツイート要素検出の最大リトライ回数
@@ -60,11 +79,7 @@ def log_error(msg: str):
 
 def check_playwright():
     """playwright がインポートできるかチェック"""
-    try:
-        import playwright  # noqa: F401
-        return True
-    except ImportError:
-        return False
+    return sync_playwright is not None
 
 
 def _load_browser_cookies():
@@ -150,6 +165,10 @@ def _has_auth_cookies(context) -> bool:
         return False
 
 
+_IMAGE_NAME_RE = re.compile(r"([?&])name=[^&#]*")
+_IMAGE_FORMAT_RE = re.compile(r"[?&]format=([^&#]+)")
+
+
 def convert_image_url_to_orig(url: str) -> tuple[str, str]:
     """
     画像URLをオリジナル品質に変換する。
@@ -159,27 +178,102 @@ def convert_image_url_to_orig(url: str) -> tuple[str, str]:
     https://pbs.twimg.com/media/XXXXX?format=jpg&name=small
     → https://pbs.twimg.com/media/XXXXX?format=jpg&name=orig
     """
-    parsed = urlparse(url)
-    params = parse_qs(parsed.query)
-
-    fmt = params.get("format", ["jpg"])[0]
+    # 形の決まった twimg の URL なので、クエリを分解せず正規表現で書き換える
+    fmt_match = _IMAGE_FORMAT_RE.search(url)
+    fmt = fmt_match.group(1) if fmt_match else "jpg"
     # name=orig に変換
-    params["name"] = ["orig"]
-    if "format" in params:
-        params["format"] = [fmt]
-
-    new_query = urlencode({k: v[0] for k, v in params.items()})
-    orig_url = f"{parsed.scheme}://{parsed.netloc}{parsed.path}?{new_query}"
+    if _IMAGE_NAME_RE.search(url):
+        orig_url = _IMAGE_NAME_RE.sub(r"\1name=orig", url)
+    else:
+        sep = "&" if "?" in url else "?"
+        orig_url = f"{url}{sep}name=orig"
     return orig_url, fmt
 
 
-def extract_all_tweets_batch(page) -> list[dict]:
+def _loads_json(raw: str):
+    """orjson があれば使い、なければ標準 json で JSON 文字列を読む"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def extract_all_tweets_batch(page, known_ids) -> tuple[list[dict], dict | None]:
     """
-    ページ上の全ツイート要素からデータを一括抽出する。
+    ページ上の全ツイート要素から、未取得のツイートのデータを一括抽出する。
     1回の evaluate で全ツイートを処理することで、JSブリッジの往復回数を削減。
+
+    取得済み ID はページ側の Set に保持し、既知のツイートはブリッジを渡さない。
+    処理済みの article 要素には data-scraped 属性でツイートIDを記録し、
+    同じツイートのままなら次回以降は中身を調べない（使い回された要素は ID で見分ける）。
+    ページ遷移で Set が消えた場合だけ known_ids 全体を送り直す。
+    結果はページ側で JSON 文字列にして返し、オブジェクト単位の変換を避ける。
+    同じ evaluate でページ状態（_probe_page_state と同じ内容）も返す。
+    Returns: (新規ツイートのリスト, ページ状態。取得失敗時は None)
     """
     try:
-        results = page.evaluate("""() => {
+        raw = page.evaluate(_EXTRACT_TWEETS_JS, None)
+        if raw is None:
+            raw = page.evaluate(_EXTRACT_TWEETS_JS, list(known_ids))
+        if not raw:
+            return [], None
+        result = _loads_json(raw)
+        return result["tweets"], result["state"]
+    except (RuntimeError, TimeoutError, ValueError, PlaywrightError) as e:
+        log_error(f"ツイートデータ一括抽出エラー: {e}")
+        # 返せなかった ID がページ側で既知扱いにならないよう破棄する
+        try:
+            page.evaluate("""() => {
+                delete window.__xKnownTweetIds;
+                for (const el of document.querySelectorAll("article[data-scraped]")) {
+                    delete el.dataset.scraped;
+                }
+            }""")
+        except (RuntimeError, TimeoutError, PlaywrightError):
+            pass
+        return [], None
+
+
+# ページ状態（割り込みボタン・ローディング表示・結果なし/エラー表示）を調べる JS 関数
+# （:has-text は Playwright 独自のため、ページ側ではテキストの部分一致で判定する）
+_PAGE_STATE_JS_FN = """function pageState() {
+    const visible = el => el.getClientRects().length > 0;
+    const state = {retry: false, showMore: false, spinner: false, empty: false, notice: null};
+    for (const el of document.querySelectorAll('div[role="button"], button')) {
+        if (state.retry && state.showMore) break;
+        const text = el.textContent.toLowerCase();
+        if (!state.retry && (text.includes("retry") || text.includes("再試行")) && visible(el)) {
+            state.retry = true;
+        } else if (!state.showMore && el.tagName === "DIV"
+                && (text.includes("show") || text.includes("もっと見る") || text.includes("表示"))
+                && visible(el)) {
+            state.showMore = true;
+        }
+    }
+    const spinner = document.querySelector(
+        'div[role="progressbar"], svg circle[r="10"], '
+        + 'div[data-testid="cellInnerDiv"] > div[style*="height: 0"]');
+    state.spinner = !!spinner && visible(spinner);
+    const notice = document.querySelector(
+        '[data-testid="empty_state_header_text"], [data-testid="error-detail"]');
+    state.notice = notice ? notice.innerText.slice(0, 200) : null;
+    state.empty = !!notice && notice.matches('[data-testid="empty_state_header_text"]');
+    return state;
+}"""
+
+
+_EXTRACT_TWEETS_JS = """(knownIds) => {
+            """ + _PAGE_STATE_JS_FN + """
+            if (!window.__xKnownTweetIds) {
+                // ページ遷移で消えている: Python 側に全件を要求する
+                if (knownIds === null) return null;
+                window.__xKnownTweetIds = new Set(knownIds);
+            }
+            const known = window.__xKnownTweetIds;
+            const STATUS_RE = /\\/status\\/(\\d+)/;
+            const NUM_RE = /^([\\d.]+)([KMB])?$/i;
+            const MULT = {K: 1e3, M: 1e6, B: 1e9};
+            const REPOST_RE = /reposted|リポスト/;
+            const REPLY_RE = /Replying to|返信先/;
             const articles = document.querySelectorAll('article[data-testid="tweet"]');
             const tweets = [];
 
@@ -189,11 +283,10 @@ def extract_all_tweets_batch(page) -> list[dict]:
                 if (span) {
                     const text = span.innerText.trim();
                     if (!text) return 0;
-                    const multipliers = {"K": 1000, "M": 1000000, "B": 1000000000};
-                    const match = text.match(/^([\\d.]+)([KMB])?$/i);
+                    const match = NUM_RE.exec(text);
                     if (match) {
                         const num = parseFloat(match[1]);
-                        const mult = match[2] ? multipliers[match[2].toUpperCase()] : 1;
+                        const mult = match[2] ? MULT[match[2].toUpperCase()] : 1;
                         return Math.round(num * mult);
                     }
                     return parseInt(text.replace(/,/g, "")) || 0;
@@ -206,10 +299,16 @@ def extract_all_tweets_batch(page) -> list[dict]:
 
                 const statusLink = el.querySelector('a[href*="/status/"]');
                 if (statusLink) {
-                    const match = statusLink.href.match(/\\/status\\/(\\d+)/);
+                    const match = STATUS_RE.exec(statusLink.href);
                     if (match) result.tweet_id = match[1];
                 }
                 if (!result.tweet_id) continue;
+                // 処理済みの要素は data-scraped にツイートIDを記録してある。
+                // タイムラインは article 要素を使い回すため、ID が一致するときだけ読み飛ばす
+                if (el.dataset.scraped === result.tweet_id) continue;
+                el.dataset.scraped = result.tweet_id;
+                if (known.has(result.tweet_id)) continue;
+                known.add(result.tweet_id);
 
                 const textEl = el.querySelector('div[data-testid="tweetText"]');
                 result.text = textEl ? textEl.innerText : "";
@@ -217,11 +316,8 @@ def extract_all_tweets_batch(page) -> list[dict]:
                 const timeEl = el.querySelector("time");
                 result.timestamp = timeEl ? timeEl.getAttribute("datetime") : null;
 
-                const imgs = el.querySelectorAll('img[src*="pbs.twimg.com/media"]');
-                result.images = [];
-                for (const img of imgs) {
-                    result.images.push(img.src);
-                }
+                result.images = Array.from(
+                    el.querySelectorAll('img[src*="pbs.twimg.com/media"]'), img => img.src);
 
                 result.metrics = {};
                 const replyEl = el.querySelector('button[data-testid="reply"]');
@@ -234,30 +330,20 @@ def extract_all_tweets_batch(page) -> list[dict]:
 
                 const socialContext = el.querySelector('span[data-testid="socialContext"]');
                 result.is_retweet = false;
-                if (socialContext) {
-                    const text = socialContext.innerText;
-                    if (text.includes("reposted") || text.includes("リポスト")) {
-                        result.is_retweet = true;
-                    }
+                if (socialContext && REPOST_RE.test(socialContext.innerText)) {
+                    result.is_retweet = true;
                 }
 
                 const replyTo = el.querySelector('div[id^="id__"]');
                 result.is_reply = false;
-                if (replyTo) {
-                    const text = replyTo.innerText;
-                    if (text.includes("Replying to") || text.includes("返信先")) {
-                        result.is_reply = true;
-                    }
+                if (replyTo && REPLY_RE.test(replyTo.innerText)) {
+                    result.is_reply = true;
                 }
 
                 tweets.push(result);
             }
-            return tweets;
-        }""")
-        return results or []
-    except (RuntimeError, TimeoutError) as e:
-        log_error(f"ツイートデータ一括抽出エラー: {e}")
-        return []
+            return JSON.stringify({tweets, state: pageState()});
+        }"""
 
 
 # Chromium 自動化検知回避用の起動オプション
@@ -420,80 +506,109 @@ def ensure_login(playwright_module, session_path: str) -> tuple:
     # 既存プロファイルが未ログインの場合に備え、許可時だけ通常ブラウザCookieを先に注入する
     _inject_browser_cookies(context)
 
-    page.goto("https://x.com/home", wait_until="domcontentloaded", timeout=30000)
-    time.sleep(5)  # X.comの初期ロードに十分な時間を確保
+    page.goto("https://x.com/home", wait_until="commit", timeout=30000)
+    # ログイン済み/未ログインどちらかの画面が描画されるまで待つ（固定待ちはしない）
+    _wait_for_any(page, f"{LOGGED_IN_SELECTOR}, {LOGIN_FORM_SELECTOR}", 15000)
 
     if _is_logged_in(page, context):
         log("セッション復元に成功したのだ！")
         return context, page
 
-    # 未ログイン → そのまま headed で手動ログイン待ち
+    # 未ログイン → 同じ headed ブラウザのまま手動ログイン待ち（再起動しない）
     log_error("未ログイン状態なのだ。")
     log("手動ログイン待機に切り替えるのだ。")
-    context.close()
-    return _manual_login(playwright_module, user_data_dir)
+    return _manual_login(context, page)
+
+
+# ログイン済み画面にだけ存在する要素
+LOGGED_IN_SELECTOR = (
+    'a[data-testid="AppTabBar_Home_Link"], '
+    'button[data-testid="SideNav_AccountSwitcher_Button"], '
+    'a[href="/home"][role="link"]'
+)
+
+# 未ログイン時のログイン導線
+LOGIN_FORM_SELECTOR = 'a[href="/login"], a[data-testid="loginButton"], input[autocomplete="username"]'
+
+# 検索結果の読み込みが終わったことを示す要素
+SEARCH_READY_SELECTOR = (
+    'article[data-testid="tweet"], '
+    'div[data-testid="empty_state_header_text"], '
+    'div[data-testid="error-detail"]'
+)
+
+
+def _wait_for_any(page, selector: str, timeout_ms: int) -> bool:
+    """selector のいずれかが DOM に現れるまで待つ。タイムアウトしても処理は続行する"""
+    try:
+        page.wait_for_selector(selector, state="attached", timeout=timeout_ms)
+        return True
+    except PlaywrightError as e:
+        log(f"ページ読み込み待機がタイムアウトしたのだ（続行するのだ）: {e}")
+        return False
+
+
+def _wait_ready(page, timeout_ms: int = 15000) -> bool:
+    """検索結果・結果なし・エラーのいずれかが表示されるまで待つ（固定時間は待たない）"""
+    ready = _wait_for_any(page, SEARCH_READY_SELECTOR, timeout_ms)
+    # 直後の evaluate 前に描画を少しだけ落ち着かせる
+    time.sleep(0.5)
+    return ready
+
 
+# ログイン済み要素があるか、URL がログインフローから離れていれば true
+_LOGIN_DONE_JS = """(selector) => {
+    if (document.querySelector(selector)) return true;
+    const path = location.pathname;
+    return !path.startsWith("/login") && !path.startsWith("/i/flow");
+}"""
 
-def _manual_login(playwright_module, user_data_dir: str) -> tuple:
+
+def _manual_login(context, page) -> tuple:
     """
-    ヘッドありブラウザを起動し、ユーザーの手動ログインを待機する。
+    セッション確認に使ったヘッドありブラウザのまま、ユーザーの手動ログインを待機する。
     ログイン完了をDOM検査で自動検知して処理を進める。
     Returns: (context, page)
     """
-    log("ブラウザを起動中なのだ... X.comにログインしてください。")
-    context = _launch_persistent(playwright_module, user_data_dir, headless=False)
-    page = context.pages[0] if context.pages else context.new_page()
+    log("ログインページを開くのだ... X.comにログインしてください。")
     page.goto("https://x.com/i/flow/login", wait_until="domcontentloaded", timeout=30000)
 
     log("ブラウザが開きました。X.comにログインしてください...")
     log("ログイン完了を自動検知します。そのままお待ちください。")
 
-    # ログイン完了をポーリングで検知（最大10分待機）
+    # ログイン完了を検知（最大10分待機）
+    # URLを変えずにDOMだけ書き換わるケースもあるため、ログイン済み要素の出現と
+    # URL が /login・/i/flow から離れたことのどちらか早い方で判定する
+    # （セレクタが X 側の変更で合わなくなっても URL で検知できるように）
     max_wait = 600  # 10分（2段階認証等を考慮）
-    elapsed = 0
-    poll_interval = 3  # 3秒間隔で高速ポーリング
+    started = time.monotonic()
+    login_done = threading.Event()
 
-    while elapsed < max_wait:
-        time.sleep(poll_interval)
-        elapsed += poll_interval
+    def _heartbeat():
+        # ページには触れない（sync API はスレッドをまたいで使えない）
+        while not login_done.wait(30):
+            log(f"ログイン待機中... ({int(time.monotonic() - started)}秒経過)")
 
-        try:
-            current_url = page.url
-        except (RuntimeError, ConnectionError) as e:
-            # ブラウザが閉じられた場合
-            log_error(f"ブラウザが閉じられたのだ。処理を中断するのだ: {e}")
+    heartbeat = threading.Thread(target=_heartbeat, daemon=True)
+    heartbeat.start()
+    try:
+        page.wait_for_function(
+            _LOGIN_DONE_JS, arg=LOGGED_IN_SELECTOR, polling=1000, timeout=max_wait * 1000,
+        )
+        log(f"ログイン完了を検知したのだ！ URL: {page.url}")
+    except PlaywrightTimeoutError:
+        # DOM が想定と違う場合に備え、URL と Cookie による判定で最終確認する
+        if not _is_logged_in(page, context):
+            log("ログイン待機がタイムアウトしたのだ。(10分)")
+            context.close()
             sys.exit(1)
-
-        # 方法1: URLが明確にログイン後のページになった
-        if "/login" not in current_url and "/i/flow" not in current_url:
-            log(f"ログインページ以外に遷移を検知: {current_url}")
-            # 少し待ってからDOM確認（ページ読み込み完了を待つ）
-            time.sleep(2)
-            if _is_logged_in(page, context):
-                log(f"ログイン完了を検知したのだ！ URL: {current_url}")
-                break
-
-        # 方法2: URLがログインページのままでもDOMにログイン済み要素が出現
-        # （X.comのSPAがURLを変えずにDOMを書き換えるケース）
-        try:
-            logged_in_el = page.query_selector(
-                'a[data-testid="AppTabBar_Home_Link"], '
-                'button[data-testid="SideNav_AccountSwitcher_Button"], '
-                'a[href="/home"][role="link"]'
-            )
-            if logged_in_el:
-                log(f"ログイン済みDOM要素を検知したのだ！ URL: {current_url}")
-                break
-        except (RuntimeError, TimeoutError) as e:
-            log_error(f"ログイン状態のDOM検出中にエラーが発生したのだ: {e}")
-
-        if elapsed % 30 == 0:
-            log(f"ログイン待機中... ({elapsed}秒経過, URL: {current_url})")
-
-    else:
-        log("ログイン待機がタイムアウトしたのだ。(10分)")
-        context.close()
+        log(f"ログイン完了を検知したのだ！ URL: {page.url}")
+    except PlaywrightError as e:
+        # ブラウザが閉じられた場合
+        log_error(f"ブラウザが閉じられたのだ。処理を中断するのだ: {e}")
         sys.exit(1)
+    finally:
+        login_done.set()
 
     if _allow_session_persistence():
         log("ログイン成功！セッションは保護されたプロファイルに保存されるのだ。")
@@ -504,18 +619,22 @@ def _manual_login(playwright_module, user_data_dir: str) -> tuple:
     return context, page
 
 
+# ツイート抽出を伴わずにページ状態だけを調べる（迂回後の待機中など）
+_PROBE_PAGE_STATE_JS = "() => {\n" + _PAGE_STATE_JS_FN + "\n    return pageState();\n}"
+
+
+def _probe_page_state(page) -> dict:
+    """再試行/もっと見るボタンとローディング表示の有無を返す"""
+    try:
+        return page.evaluate(_PROBE_PAGE_STATE_JS)
+    except (RuntimeError, TimeoutError, PlaywrightError) as e:
+        log_error(f"ページ状態の確認中にエラーが発生したのだ: {e}")
+        return {"retry": False, "showMore": False, "spinner": False, "empty": False, "notice": None}
+
+
 def _check_loading(page) -> bool:
     """ページが読み込み中かどうかを判定する"""
-    try:
-        # ローディングスピナー（プログレスバー）の検出
-        spinner = page.query_selector(
-            'div[role="progressbar"], '
-            'svg circle[r="10"], '  # X.comのローディングアニメーション
-            'div[data-testid="cellInnerDiv"] > div[style*="height: 0"]'
-        )
-        return spinner is not None and spinner.is_visible()
-    except (RuntimeError, TimeoutError):
-        return False
+    return _probe_page_state(page)["spinner"]
 
 
 def _human_scroll(page, distance: float = 1500):
@@ -566,13 +685,20 @@ def _human_scroll(page, distance: float = 1500):
                 time.sleep(random.uniform(0.005, 0.02))
 
 
-def _handle_interruptions(page):
+def _handle_interruptions(page, state: dict | None = None):
     """
     スクロール中に発生する各種ボタンを検出して対処する。
     - 「再試行」ボタン
     - 「もっと見る」ボタン
     エラー表示は検出しない（新規0件で即座に迂回＋再検索するため）。
+    state にツイート抽出時のページ状態を渡すと、改めて調べない。
     """
+    # 何も無いとき（大半のスクロール）はこの1往復で終わる
+    if state is None:
+        state = _probe_page_state(page)
+    if not state["retry"] and not state["showMore"]:
+        return
+
     try:
         # 「再試行 / Retry」ボタン
         retry_button = page.query_selector(
@@ -603,14 +729,97 @@ def _handle_interruptions(page):
         log_error(f"割り込み要素の処理中にエラーが発生したのだ: {e}")
 
 
-def scrape_tweets(page, username: str) -> list[dict]:
+def _parse_timestamp(ts: str) -> datetime | None:
+    """ツイートの ISO 8601 タイムスタンプ（末尾 Z）を datetime にする"""
+    try:
+        if sys.version_info >= (3, 11):
+            return datetime.fromisoformat(ts)
+        return datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    except (ValueError, TypeError) as e:
+        log_error(f"タイムスタンプ解析エラー (値: {ts}): {e}")
+        return None
+
+
+# 1回のスクロール量（px）。取得状況に応じてこの範囲で増減する
+SCROLL_DISTANCE_DEFAULT = 2000
+SCROLL_DISTANCE_MIN = 800
+SCROLL_DISTANCE_MAX = 5000
+# 新規なしがこの回数続いたら、迂回の前に一度ページ末尾まで移動する
+JUMP_TO_BOTTOM_AFTER = 3
+
+# 検索が行き詰まったときに挟む迂回先（人間的な行動を模倣）
+DETOUR_PAGES = (
+    "https://x.com/home",
+    "https://x.com/explore",
+    "https://x.com/explore/tabs/trending",
+    "https://x.com/notifications",
+)
+
+
+# Phase 1 の途中経過（1行1ツイートで追記する）
+CHECKPOINT_DIRNAME = "x_checkpoints"
+
+
+def _checkpoint_path(session_path: str, username: str) -> str:
+    """
+    途中経過ファイルのパスを返す。
+    出力フォルダは実行ごとに変わるため、プロファイルと同じ場所にユーザー名単位で置く。
+    """
+    parent = os.path.dirname(session_path) or os.getcwd()
+    checkpoint_dir = os.path.join(parent, CHECKPOINT_DIRNAME)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    safe_name = re.sub(r"\W", "_", username.lower())
+    return os.path.join(checkpoint_dir, f"{safe_name}.partial.jsonl")
+
+
+def _append_jsonl(path: str, records: list[dict]):
+    """レコードを JSON Lines として追記する（既存分は書き直さない）"""
+    if orjson is not None:
+        data = b"".join(orjson.dumps(r) + b"\n" for r in records)
+    else:
+        # 人が読むファイルではないので、標準 json の高速な ASCII 出力をそのまま使う
+        data = "".join(json.dumps(r) + "\n" for r in records).encode("ascii")
+    try:
+        with open(path, "ab") as f:
+            f.write(data)
+    except OSError as e:
+        log_error(f"途中経過の書き込みに失敗したのだ: {e}")
+
+
+def _load_checkpoint(path: str) -> list[dict]:
+    """途中経過の JSON Lines を読む。書き込み途中で壊れた行は読み飛ばす"""
+    records = []
+    try:
+        with open(path, "rb+") as f:
+            line = b""
+            for line in f:
+                try:
+                    data = _loads_json(line)
+                except ValueError:
+                    continue
+                if isinstance(data, dict) and data.get("tweet_id"):
+                    records.append(data)
+            # 末尾が改行で終わっていなければ、続きの追記が壊れた行に連結されないよう区切る
+            if line and not line.endswith(b"\n"):
+                f.write(b"\n")
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        log_error(f"途中経過の読み込みに失敗したのだ: {e}")
+    return records
+
+
+def scrape_tweets(page, username: str, checkpoint_path: str | None = None) -> list[dict]:
     """
     Phase 1: from:username 検索で全ツイートを取得する。
     無限スクロールで最古まで到達。
     新規ツイートが取得できなくなったら即座に別ページを巡回し、
     until: 付き検索で再開することでBOT対策を回避する。
+    checkpoint_path を渡すと、新規ツイートをスクロールごとに JSON Lines で追記する。
+    前回中断時の checkpoint_path が残っていれば読み込み、until: 付きで続きから再開する。
     """
-    tweets = {}  # tweet_id → tweet_data
+    seen_ids: set[str] = set()  # 取得済みツイートID（重複判定用）
+    tweets_list: list[dict] = []  # 取得順のツイートデータ
     base_search_query = f"from:{username} -filter:retweets"
     search_url = f"https://x.com/search?q={quote(base_search_query)}&src=typed_query&f=live"
 
@@ -622,28 +831,43 @@ def scrape_tweets(page, username: str) -> list[dict]:
             q = base_search_query
         return f"https://x.com/search?q={quote(q)}&src=typed_query&f=live"
 
+    oldest_dt = None  # 取得済みツイートの最古タイムスタンプ（追加時に更新）
+
     def _get_oldest_tweet_date() -> str | None:
         """取得済みツイートの中で最も古いタイムスタンプの翌日を返す（until: 用）。"""
-        oldest_ts = None
-        for t in tweets.values():
-            ts = t.get("timestamp")
-            if ts:
-                try:
-                    dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
-                    if oldest_ts is None or dt < oldest_ts:
-                        oldest_ts = dt
-                except (ValueError, TypeError) as e:
-                    log_error(f"タイムスタンプ解析エラー (値: {ts}): {e}")
-        if oldest_ts:
+        if oldest_dt:
             # until は「その日を含まない」ので +1日
-            from datetime import timedelta
-            until_dt = oldest_ts + timedelta(days=1)
+            until_dt = oldest_dt + timedelta(days=1)
             return until_dt.strftime("%Y-%m-%d")
         return None
 
+    def _add_tweet(data: dict) -> bool:
+        """未取得のツイートなら記録して True を返す。"""
+        nonlocal oldest_dt
+        tid = data["tweet_id"]
+        if tid in seen_ids:
+            return False
+        seen_ids.add(tid)
+        tweets_list.append(data)
+        ts = data.get("timestamp")
+        if ts:
+            dt = _parse_timestamp(ts)
+            if dt is not None and (oldest_dt is None or dt < oldest_dt):
+                oldest_dt = dt
+        return True
+
+    # 前回中断した途中経過があれば読み込み、その続き（より古い側）から再開する
+    if checkpoint_path:
+        for data in _load_checkpoint(checkpoint_path):
+            _add_tweet(data)
+        if seen_ids:
+            log(f"前回の途中経過から {len(seen_ids)} 件を読み込んだのだ。続きから再開するのだ。")
+            search_url = _build_search_url(_get_oldest_tweet_date())
+
     log(f"検索URL: {search_url}")
-    page.goto(search_url, wait_until="domcontentloaded", timeout=30000)
-    time.sleep(5)  # 検索結果の読み込みに十分な時間を確保
+    page.goto(search_url, wait_until="commit", timeout=30000)
+    # 検索結果（または結果なし表示）が出た時点で次へ進む
+    _wait_ready(page)
 
     # リダイレクト先URLをログ
     log(f"検索後のURL: {page.url}")
@@ -671,6 +895,7 @@ def scrape_tweets(page, username: str) -> list[dict]:
     scroll_count = 0
     no_new_count = 0
     last_save_count = 0
+    scroll_distance = SCROLL_DISTANCE_DEFAULT
     renavigate_count = 0     # 迂回＋再検索した回数
     max_renavigate = 5       # 連続で新規0のまま迂回した上限（＝本当の末端）
     prev_total = 0           # 前回の迂回時の合計件数（進捗チェック用）
@@ -683,27 +908,22 @@ def scrape_tweets(page, username: str) -> list[dict]:
             log(f"迂回上限({max_renavigate}回)に到達。完了とするのだ。")
             return False
         # 前回迂回時から1件も増えていなければ本当の末端
-        if renavigate_count > 1 and len(tweets) == prev_total:
+        if renavigate_count > 1 and len(seen_ids) == prev_total:
             log("前回の迂回から新規ツイートが増えていないのだ。末端に到達したと判断するのだ。")
             return False
-        prev_total = len(tweets)
+        prev_total = len(seen_ids)
         log(f"新規ツイートなし。別ページを巡回して再検索するのだ（{renavigate_count}/{max_renavigate}）")
-        # 複数の別ページを順番に巡回（人間的な行動を模倣）
-        detour_pages = [
-            "https://x.com/home",
-            "https://x.com/explore",
-            "https://x.com/explore/tabs/trending",
-            "https://x.com/notifications",
-        ]
-        for detour_url in detour_pages:
-            try:
-                log(f"  → {detour_url}")
-                page.goto(detour_url, wait_until="domcontentloaded", timeout=30000)
-                time.sleep(random.uniform(2, 4))
-                _human_scroll(page, random.uniform(800, 1500))
-                time.sleep(random.uniform(1, 3))
-            except (RuntimeError, TimeoutError) as e:
-                log_error(f"  迂回ページ遷移エラー（無視して続行）: {e}")
+        # 別ページを1つだけ挟む（until: で再開するためフィード状態のリセットはこれで足りる）
+        detour_url = random.choice(DETOUR_PAGES)
+        try:
+            log(f"  → {detour_url}")
+            page.goto(detour_url, wait_until="commit", timeout=30000)
+            _wait_for_any(page, 'div[data-testid="primaryColumn"]', 15000)
+            time.sleep(random.uniform(0.5, 1.5))
+            _human_scroll(page, random.uniform(800, 1500))
+            time.sleep(random.uniform(1, 2))
+        except (RuntimeError, TimeoutError) as e:
+            log_error(f"  迂回ページ遷移エラー（無視して続行）: {e}")
         # until: 付き検索URLで再開（既取得分のスクロールが不要になる）
         until_date = _get_oldest_tweet_date()
         search_url = _build_search_url(until_date)
@@ -711,8 +931,8 @@ def scrape_tweets(page, username: str) -> list[dict]:
             log(f"until:{until_date} 付きで検索を再開するのだ...")
         else:
             log("日付情報がないため、通常検索で再開するのだ...")
-        page.goto(search_url, wait_until="domcontentloaded", timeout=30000)
-        time.sleep(random.uniform(4, 7))
+        page.goto(search_url, wait_until="commit", timeout=30000)
+        _wait_ready(page)
         # 検索結果が読み込まれるまでリトライ（最大5回）
         for wait_try in range(MAX_RELOAD_ATTEMPTS):
             try:
@@ -735,71 +955,93 @@ def scrape_tweets(page, username: str) -> list[dict]:
     while True:
         scroll_count += 1
 
-        # 全ツイートを一括抽出（1回のJS実行で全件処理）
-        all_tweet_data = extract_all_tweets_batch(page)
+        # 全ツイートを一括抽出（1回のJS実行で全件処理、ページ状態も同時に取得）
+        all_tweet_data, page_state = extract_all_tweets_batch(page, seen_ids)
 
         # 初回スクロールで要素がない場合のデバッグ
-        if scroll_count == 1 and len(all_tweet_data) == 0:
+        # （既知のツイートは返らないため、まだ1件も取得していない場合に限る）
+        if scroll_count == 1 and not seen_ids and not all_tweet_data:
             log("初回スクロールでツイート要素が見つからないのだ。ページ構造を確認中...")
-            try:
-                error_text = page.evaluate("""() => {
-                    const el = document.querySelector('[data-testid="empty_state_header_text"], [data-testid="error-detail"]');
-                    return el ? el.innerText : null;
-                }""")
-                if error_text:
-                    log(f"エラーメッセージ検出: {error_text}")
-            except (RuntimeError, TimeoutError) as e:
-                log_error(f"デバッグ情報取得エラー: {e}")
+            if page_state and page_state["notice"]:
+                log(f"エラーメッセージ検出: {page_state['notice']}")
+
+        # ボタン対処（再試行/もっと見る等）。状態は抽出時に取得済み
+        _handle_interruptions(page, page_state)
 
         new_count = 0
         for data in all_tweet_data:
             if data and data.get("tweet_id"):
-                tid = data["tweet_id"]
-                if tid not in tweets:
-                    tweets[tid] = data
+                if _add_tweet(data):
                     new_count += 1
 
         if new_count > 0:
             no_new_count = 0
             renavigate_count = 0  # 正常取得できたら迂回カウントもリセット
+            if checkpoint_path:
+                _append_jsonl(checkpoint_path, tweets_list[-new_count:])
         else:
             no_new_count += 1
 
-        log(f"スクロール #{scroll_count}, 新規: {new_count}, 取得ツイート合計: {len(tweets)}")
+        log(f"スクロール #{scroll_count}, 新規: {new_count}, 取得ツイート合計: {len(seen_ids)}")
 
         # 新規0件が5回続いたら迂回＋再検索
         if no_new_count >= 5:
             log(f"連続{no_new_count}回新規ツイートなし。")
+            # 「結果なし」表示が出ていれば末端が確定しているので、迂回せずに終える
+            if page_state and page_state["empty"]:
+                log(f"検索結果なしの表示を検知したのだ。末端に到達したと判断するのだ: {page_state['notice']}")
+                break
             if not _detour_and_resume():
                 break
             continue
 
         # 100件ごとに中間ログ
-        if len(tweets) - last_save_count >= 100:
-            log(f"--- {len(tweets)} 件のツイートを取得済み ---")
-            last_save_count = len(tweets)
+        if len(seen_ids) - last_save_count >= 100:
+            log(f"--- {len(seen_ids)} 件のツイートを取得済み ---")
+            last_save_count = len(seen_ids)
+
+        # スクロール量は取得状況で調整する
+        # （大量に取れたら読み飛ばしを避けて短く、取れなければ読み込みを促すため長く）
+        if new_count >= 10:
+            scroll_distance = max(SCROLL_DISTANCE_MIN, scroll_distance / 2)
+        elif new_count == 0:
+            scroll_distance = min(SCROLL_DISTANCE_MAX, scroll_distance * 2)
+        else:
+            scroll_distance = SCROLL_DISTANCE_DEFAULT
 
-        # スクロール（マウスホイールでBOT検知を回避）
-        _human_scroll(page, random.uniform(1500, 2500))
+        # 新規なしが続くときは末尾まで一気に移動し、仮想リストに次の分を読み込ませる
+        # （迂回する前の最後の一押し。それ以外はマウスホイール等でBOT検知を回避）
+        if no_new_count == JUMP_TO_BOTTOM_AFTER:
+            try:
+                page.evaluate("() => window.scrollTo(0, document.body.scrollHeight)")
+                log("新規なしが続くので末尾まで移動したのだ")
+            except (RuntimeError, TimeoutError) as e:
+                log_error(f"末尾への移動中にエラーが発生したのだ: {e}")
+        else:
+            _human_scroll(page, scroll_distance * random.uniform(0.75, 1.25))
 
         # コンテンツ読み込み待機（短め）
         time.sleep(random.uniform(0.5, 1.0))
 
-        # ボタン対処（再試行/もっと見る等）
-        _handle_interruptions(page)
+    # 最後まで取得できたので、途中経過は不要
+    if checkpoint_path:
+        try:
+            os.remove(checkpoint_path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log_error(f"途中経過ファイルの削除に失敗したのだ: {e}")
 
-    return list(tweets.values())
+    return tweets_list
 
 
 def download_images(tweets: list[dict], output_dir: str) -> int:
     """
     Phase 2: 全ツイートの画像をオリジナル品質でダウンロードする。
-    httpx を使用して順次ダウンロード。
+    httpx.AsyncClient で並列にダウンロードする。
     """
-    import httpx
-
     # 画像URL一覧を収集（リツイート/リポストの画像は除外）
-    image_tasks = []  # (tweet_id, index, orig_url, format, filename)
+    image_tasks = []  # (orig_url, filename)
     skipped_retweets = 0
     for tweet in tweets:
         if not tweet.get("images"):
@@ -810,7 +1052,7 @@ def download_images(tweets: list[dict], output_dir: str) -> int:
         for idx, img_url in enumerate(tweet["images"]):
             orig_url, fmt = convert_image_url_to_orig(img_url)
             filename = f"{tweet['tweet_id']}_{idx}.{fmt}"
-            image_tasks.append((tweet["tweet_id"], idx, orig_url, fmt, filename))
+            image_tasks.append((orig_url, filename))
 
     total = len(image_tasks)
     if skipped_retweets > 0:
@@ -820,88 +1062,133 @@ def download_images(tweets: list[dict], output_dir: str) -> int:
         return 0
 
     log(f"画像ダウンロード開始: {total} 枚")
-    downloaded = 0
-    failed = 0
+    downloaded, failed = asyncio.run(_download_all(image_tasks, output_dir))
+    log(f"画像ダウンロード完了: {downloaded}/{total} 成功, {failed} 失敗")
+    return downloaded
 
-    with httpx.Client(
-        timeout=60.0,
-        follow_redirects=True,
-        headers={
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-            "Referer": "https://x.com/"
-        }
-    ) as client:
-        for i, (tweet_id, idx, orig_url, fmt, filename) in enumerate(image_tasks):
-            filepath = os.path.join(output_dir, filename)
-
-            # 既にダウンロード済みならスキップ
-            if os.path.exists(filepath) and os.path.getsize(filepath) > 0:
-                log(f"画像DL {i + 1}/{total}: {filename} (スキップ: 既存)")
-                downloaded += 1
-                # ツイートデータの画像情報を更新
-                _update_tweet_image_info(tweets, tweet_id, idx, orig_url, filename, True)
-                continue
 
-            success = False
-            for retry in range(3):
-                try:
-                    response = client.get(orig_url)
-                    response.raise_for_status()
+def _existing_file_sizes(output_dir: str) -> dict[str, int]:
+    """出力先にあるファイル名とサイズの対応を返す"""
+    try:
+        with os.scandir(output_dir) as it:
+            return {e.name: e.stat().st_size for e in it if e.is_file()}
+    except OSError as e:
+        log_error(f"出力先の走査に失敗したのだ: {e}")
+        return {}
 
-                    with open(filepath, "wb") as f:
-                        f.write(response.content)
 
-                    downloaded += 1
-                    success = True
-                    log(f"画像DL {i + 1}/{total}: {filename} ({len(response.content) / 1024:.1f} KB)")
+# 画像ダウンロードの同時実行数
+DOWNLOAD_CONCURRENCY = 12
+# 429 を受けたときに全体で待つ秒数（Retry-After が無い場合）
+RATE_LIMIT_PAUSE = 5.0
 
-                    # ツイートデータの画像情報を更新
-                    _update_tweet_image_info(tweets, tweet_id, idx, orig_url, filename, True)
-                    break
 
-                except (httpx.HTTPStatusError, httpx.TimeoutException, httpx.ConnectError, OSError) as e:
-                    if retry < 2:
+async def _download_all(image_tasks: list[tuple], output_dir: str) -> tuple[int, int]:
+    """
+    画像を並列にダウンロードする。
+    各リクエストは遅延が大きく CPU はほぼ使わないため、同時実行数を絞って重ねる。
+    Returns: (成功数, 失敗数)
+    """
+    import httpx
+
+    # 画像はすべて pbs.twimg.com なので、HTTP/2 が使えれば1本の接続に多重化する
+    # （h2 が無い環境では HTTP/1.1 のまま）
+    http2 = importlib.util.find_spec("h2") is not None
+
+    total = len(image_tasks)
+    # 既存ファイルは1回のディレクトリ走査でまとめて調べる
+    existing = _existing_file_sizes(output_dir)
+    # 区切り文字付きの出力先（画像ごとに os.path.join しない）
+    output_prefix = os.path.join(output_dir, "")
+    done = 0
+    downloaded = 0
+    failed = 0
+    http_version = None  # 最初に成功した応答のプロトコル（ログ用）
+    pause_until = 0.0  # 429 を受けたとき、全タスクがこの時刻まで新規リクエストを控える
+    sem = asyncio.Semaphore(DOWNLOAD_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+
+    async def download_one(client, orig_url: str, filename: str):
+        nonlocal done, downloaded, failed, http_version, pause_until
+
+        # 既にダウンロード済みならスキップ
+        if existing.get(filename, 0) > 0:
+            done += 1
+            downloaded += 1
+            log(f"画像DL {done}/{total}: {filename} (スキップ: 既存)")
+            return
+
+        filepath = output_prefix + filename
+        async with sem:
+            for retry in range(3):
+                wait = pause_until - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                try:
+                    # 全体をメモリに載せず .part に逐次書き込み、完了後に置き換える
+                    # （途中で落ちても壊れたファイルが「既存」扱いされない）
+                    part_path = filepath + ".part"
+                    async with client.stream("GET", orig_url) as response:
+                        response.raise_for_status()
+                        with open(part_path, "wb") as f:
+                            async for chunk in response.aiter_bytes(65536):
+                                f.write(chunk)
+                        size = response.num_bytes_downloaded
+                        if http_version is None:
+                            http_version = response.http_version
+                            log(f"画像ダウンロードの接続: {http_version}")
+                    os.replace(part_path, filepath)
+
+                    done += 1
+                    downloaded += 1
+                    log(f"画像DL {done}/{total}: {filename} ({size / 1024:.1f} KB)")
+                    return
+
+                except (httpx.HTTPError, OSError) as e:
+                    try:
+                        os.remove(part_path)
+                    except OSError:
+                        pass
+                    # 404 等のクライアントエラーは再試行しても結果が変わらない
+                    status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+                    retryable = not (status and 400 <= status < 500 and status not in (408, 429))
+                    if status == 429:
+                        # レート制限は全体で一度だけ待つ（各タスクが個別に叩き続けないように）
+                        retry_after = e.response.headers.get("Retry-After", "")
+                        delay = float(retry_after) if retry_after.isdigit() else RATE_LIMIT_PAUSE
+                        if loop.time() + delay > pause_until:
+                            pause_until = loop.time() + delay
+                            log(f"画像DL がレート制限されたのだ。{delay:.0f} 秒待機するのだ")
+                    if retryable and retry < 2:
                         log(f"画像DL リトライ {retry + 1}/3: {filename} ({e})")
-                        time.sleep(2)
+                        # 指数バックオフ + ジッター（同時失敗したタスクが一斉に再送しないように）
+                        await asyncio.sleep(2 ** retry + random.uniform(0, 1))
                     else:
+                        done += 1
                         log_error(f"画像DL 失敗: {filename} ({e})")
                         failed += 1
-                        _update_tweet_image_info(tweets, tweet_id, idx, orig_url, filename, False)
+                        return
 
-            # レートリミット対策: 少し待機
-            if success:
-                time.sleep(0.5)
-
-    log(f"画像ダウンロード完了: {downloaded}/{total} 成功, {failed} 失敗")
-    return downloaded
-
-
-def _update_tweet_image_info(tweets: list[dict], tweet_id: str, idx: int, orig_url: str, filename: str, downloaded: bool):
-    """ツイートデータ内の画像情報をダウンロード結果で更新する"""
-    for tweet in tweets:
-        if tweet.get("tweet_id") == tweet_id:
-            if "image_details" not in tweet:
-                tweet["image_details"] = []
-
-            # 既に同じインデックスのエントリがあれば更新
-            found = False
-            for detail in tweet["image_details"]:
-                if detail.get("index") == idx:
-                    detail["url"] = orig_url
-                    detail["filename"] = filename
-                    detail["downloaded"] = downloaded
-                    found = True
-                    break
-
-            if not found:
-                tweet["image_details"].append({
-                    "index": idx,
-                    "url": orig_url,
-                    "filename": filename,
-                    "downloaded": downloaded
-                })
-            break
+    async with httpx.AsyncClient(
+        http2=http2,
+        timeout=60.0,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=DOWNLOAD_CONCURRENCY,
+            max_keepalive_connections=DOWNLOAD_CONCURRENCY,
+            keepalive_expiry=60.0,
+        ),
+        headers={
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+            "Referer": "https://x.com/"
+        }
+    ) as client:
+        await asyncio.gather(*(
+            download_one(client, orig_url, filename)
+            for orig_url, filename in image_tasks
+        ))
 
+    return downloaded, failed
 
 
 def main():
@@ -935,8 +1222,6 @@ def main():
     elif not session_path:
         session_path = os.path.join(os.getcwd(), "lib", "playwright", "x_session.json")
 
-    from playwright.sync_api import sync_playwright
-
     context = None
     playwright_instance = None
     try:
@@ -945,27 +1230,24 @@ def main():
 
         # Phase 1: 全ツイート取得
         log("=== Phase 1: ツイート取得 ===")
-        tweets = scrape_tweets(page, username)
+        checkpoint_path = _checkpoint_path(session_path, username)
+        tweets = scrape_tweets(page, username, checkpoint_path)
         log(f"ツイート取得完了: {len(tweets)} 件")
 
         if len(tweets) == 0:
             log("ツイートが見つからなかったのだ。ユーザー名を確認してください。")
             return
 
-        # ブラウザを閉じる（画像DLにはブラウザ不要）
-        context.close()
-        context = None
-        log("ブラウザを閉じたのだ")
-
         # Phase 2: 画像ダウンロード
+        # 別スレッドで先に始め、ブラウザの終了処理（画像DLにはブラウザ不要）と重ねる
         log("=== Phase 2: 画像ダウンロード ===")
-        download_images(tweets, user_output_dir)
-
-        # DL成功画像数をカウント
-        image_count = 0
-        for tweet in tweets:
-            details = tweet.get("image_details", [])
-            image_count += sum(1 for d in details if d.get("downloaded", False))
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            download_future = executor.submit(download_images, tweets, user_output_dir)
+            context.close()
+            context = None
+            log("ブラウザを閉じたのだ")
+            # 戻り値は DL 成功数（既存ファイルのスキップを含む）なので、全ツイートを数え直さない
+            image_count = download_future.result()
 
         log(f"=== 完了! ツイート: {len(tweets)} 件, 画像: {image_count} 枚 ===")
 
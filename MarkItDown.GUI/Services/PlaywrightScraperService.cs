@@ -1,4 +1,5 @@
 using System;
+using System.Collections.Generic;
 using System.Diagnostics;
 using System.IO;
 using System.Text;
@@ -20,6 +21,7 @@ public sealed class PlaywrightScraperService
     private readonly Action<string>? _statusCallback;
     private readonly bool _allowSocialSessionPersistence;
     private bool _dependenciesInstalled;
+    private bool _httpDependenciesInstalled;
 
     public PlaywrightScraperService(
         string pythonExecutablePath,
@@ -36,7 +38,7 @@ public sealed class PlaywrightScraperService
     }
 
     /// <summary>
-    /// 必要な Python パッケージ (playwright) がインストールされているかチェックし、
+    /// 必要な Python パッケージ (playwright, orjson) がインストールされているかチェックし、
     /// なければインストールする。通常実行時の自動更新は行わない。
     /// </summary>
     public async Task EnsureDependenciesInstalledAsync(CancellationToken ct = default)
@@ -45,15 +47,9 @@ public sealed class PlaywrightScraperService
 
         _statusCallback?.Invoke("依存パッケージを確認中...");
 
-        if (!await CheckPackageInstalledAsync("playwright", ct).ConfigureAwait(false))
-        {
-            _logMessage("playwright パッケージをインストール中なのだ...");
-            await InstallPackageAsync("playwright", ct).ConfigureAwait(false);
-        }
-        else
-        {
-            _logMessage("playwright パッケージはインストール済みなのだ。通常実行では更新しないのだ。");
-        }
+        // orjson: 結果 JSON / 途中経過の高速な書き出し用（無くても標準 json で動作する）
+        await EnsurePackagesInstalledAsync(
+            [("playwright", "playwright"), ("orjson", "orjson")], ct).ConfigureAwait(false);
 
         _dependenciesInstalled = true;
     }
@@ -185,6 +181,14 @@ public sealed class PlaywrightScraperService
     /// </summary>
     public async Task ScrapeWithHttpAsync(string url, string outputPath, CancellationToken ct = default)
     {
+        // requests / beautifulsoup4 は markitdown の依存として導入済み。
+        // orjson は JSON-LD の解析と結果の書き出しを速くする（無くても標準 json で動作する）
+        if (!_httpDependenciesInstalled)
+        {
+            await EnsurePackagesInstalledAsync([("orjson", "orjson")], ct).ConfigureAwait(false);
+            _httpDependenciesInstalled = true;
+        }
+
         var appDir = Directory.GetCurrentDirectory();
         var scriptPath = Path.Combine(appDir, "Scripts", "scrape_page_http.py");
 
@@ -295,19 +299,17 @@ public sealed class PlaywrightScraperService
     {
         await EnsureDependenciesInstalledAsync(ct).ConfigureAwait(false);
 
-        // httpx パッケージの追加インストール（画像ダウンロード用）
-        if (!await CheckPackageInstalledAsync("httpx", ct).ConfigureAwait(false))
+        // httpx: 画像ダウンロード用
+        // h2: pbs.twimg.com への HTTP/2 多重化用（無くても HTTP/1.1 で動作する）
+        var packages = new List<(string Module, string Package)>
         {
-            _logMessage("httpx パッケージをインストール中なのだ...");
-            await InstallPackageAsync("httpx", ct).ConfigureAwait(false);
-        }
-
+            ("httpx", "httpx"),
+            ("h2", "h2"),
+        };
         // browser-cookie3 はブラウザCookie取り込みを明示許可した場合だけ使用する
-        if (_allowSocialSessionPersistence && !await CheckPackageInstalledAsync("browser_cookie3", ct).ConfigureAwait(false))
-        {
-            _logMessage("browser-cookie3 パッケージをインストール中なのだ...");
-            await InstallPackageAsync("browser-cookie3", ct).ConfigureAwait(false);
-        }
+        if (_allowSocialSessionPersistence)
+            packages.Add(("browser_cookie3", "browser-cookie3"));
+        await EnsurePackagesInstalledAsync(packages, ct).ConfigureAwait(false);
 
         var appDir = Directory.GetCurrentDirectory();
         var scriptPath = Path.Combine(appDir, "Scripts", "scrape_x.py");
@@ -459,25 +461,8 @@ public sealed class PlaywrightScraperService
     {
         await EnsureDependenciesInstalledAsync(ct).ConfigureAwait(false);
 
-        if (!await CheckPackageInstalledAsync("openai", ct).ConfigureAwait(false))
-        {
-            _logMessage("openai パッケージをインストール中なのだ...");
-            await InstallPackageAsync("openai", ct).ConfigureAwait(false);
-        }
-        else
-        {
-            _logMessage("openai パッケージはインストール済みなのだ。通常実行では更新しないのだ。");
-        }
-
-        if (!await CheckPackageInstalledAsync("instaloader", ct).ConfigureAwait(false))
-        {
-            _logMessage("instaloader パッケージをインストール中なのだ...");
-            await InstallPackageAsync("instaloader", ct).ConfigureAwait(false);
-        }
-        else
-        {
-            _logMessage("instaloader パッケージはインストール済みなのだ。通常実行では更新しないのだ。");
-        }
+        await EnsurePackagesInstalledAsync(
+            [("openai", "openai"), ("instaloader", "instaloader")], ct).ConfigureAwait(false);
 
         var appDir = Directory.GetCurrentDirectory();
         var scriptPath = Path.Combine(appDir, "Scripts", "scrape_instagram.py");
@@ -629,9 +614,39 @@ public sealed class PlaywrightScraperService
     }
 
     /// <summary>
-    /// pip でパッケージをインストール/更新する（ProcessHelper 使用）
+    /// 未インストールのパッケージだけをまとめて1回の pip で入れる。
+    /// 一括インストールに失敗した場合は、入れられるものだけでも入れるため個別に再試行する。
     /// </summary>
-    private async Task InstallPackageAsync(string packageName, CancellationToken ct)
+    /// <param name="packages">import 名と pip パッケージ名の組</param>
+    /// <param name="ct">キャンセルトークン</param>
+    private async Task EnsurePackagesInstalledAsync(
+        IReadOnlyList<(string Module, string Package)> packages, CancellationToken ct)
+    {
+        var missing = new List<string>();
+        foreach (var (module, package) in packages)
+        {
+            if (await CheckPackageInstalledAsync(module, ct).ConfigureAwait(false))
+                _logMessage($"{package} パッケージはインストール済みなのだ。通常実行では更新しないのだ。");
+            else
+                missing.Add(package);
+        }
+
+        if (missing.Count == 0) return;
+
+        _logMessage($"{string.Join(", ", missing)} パッケージをインストール中なのだ...");
+        if (await InstallPackagesAsync(missing, ct).ConfigureAwait(false) || missing.Count == 1)
+            return;
+
+        foreach (var package in missing)
+            await InstallPackagesAsync([package], ct).ConfigureAwait(false);
+    }
+
+    /// <summary>
+    /// pip でパッケージをインストール/更新する（ProcessHelper 使用）。
+    /// 複数指定時は1回の pip 呼び出しにまとめ、起動と依存解決のコストを1回で済ませる。
+    /// </summary>
+    /// <returns>pip が成功したら true</returns>
+    private async Task<bool> InstallPackagesAsync(IReadOnlyList<string> packageNames, CancellationToken ct)
     {
         var startInfo = new ProcessStartInfo
         {
@@ -643,11 +658,15 @@ public sealed class PlaywrightScraperService
             StandardOutputEncoding = Encoding.UTF8,
             StandardErrorEncoding = Encoding.UTF8
         };
+        startInfo.Environment["PIP_DISABLE_PIP_VERSION_CHECK"] = "1";
         startInfo.ArgumentList.Add("-m");
         startInfo.ArgumentList.Add("pip");
         startInfo.ArgumentList.Add("install");
         startInfo.ArgumentList.Add("--disable-pip-version-check");
-        startInfo.ArgumentList.Add(packageName);
+        startInfo.ArgumentList.Add("--no-input");
+        startInfo.ArgumentList.Add("--prefer-binary");
+        foreach (var packageName in packageNames)
+            startInfo.ArgumentList.Add(packageName);
 
         var (exitCode, output, error) = await ProcessUtils.RunAsync(
             startInfo, TimeoutSettings.PackageInstallTimeoutMs, ct);
@@ -657,10 +676,12 @@ public sealed class PlaywrightScraperService
         if (!string.IsNullOrEmpty(error) && exitCode != 0)
             _logError($"pip エラー: {error.TrimEnd()}");
 
+        var names = string.Join(", ", packageNames);
         if (exitCode == 0)
-            _logMessage($"{packageName} のインストール完了なのだ");
+            _logMessage($"{names} のインストール完了なのだ");
         else
-            _logError($"{packageName} のインストールに失敗したのだ");
+            _logError($"{names} のインストールに失敗したのだ");
+        return exitCode == 0;
     }
 
     // ────────────────────────────────────────────
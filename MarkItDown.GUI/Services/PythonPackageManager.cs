@@ -143,10 +143,14 @@ public class PythonPackageManager
                 StandardErrorEncoding = Encoding.UTF8
             };
 
+            startInfo.Environment["PIP_DISABLE_PIP_VERSION_CHECK"] = "1";
+
             startInfo.ArgumentList.Add("-m");
             startInfo.ArgumentList.Add("pip");
             startInfo.ArgumentList.Add("install");
             startInfo.ArgumentList.Add("--disable-pip-version-check");
+            startInfo.ArgumentList.Add("--no-input");
+            startInfo.ArgumentList.Add("--prefer-binary");
             startInfo.ArgumentList.Add(packageName);
 
             var (exitCode, output, error) = await ProcessUtils.RunAsync(
@@ -249,6 +253,8 @@ public class PythonPackageManager
                 StandardOutputEncoding = Encoding.UTF8
             };
 
+            startInfo.Environment["PIP_DISABLE_PIP_VERSION_CHECK"] = "1";
+
             startInfo.ArgumentList.Add("-m");
             startInfo.ArgumentList.Add("pip");
             startInfo.ArgumentList.Add("show");
@@ -353,10 +359,14 @@ public class PythonPackageManager
             StandardErrorEncoding = Encoding.UTF8
         };
 
+        startInfo.Environment["PIP_DISABLE_PIP_VERSION_CHECK"] = "1";
+
         startInfo.ArgumentList.Add("-m");
         startInfo.ArgumentList.Add("pip");
         startInfo.ArgumentList.Add("install");
         startInfo.ArgumentList.Add("--disable-pip-version-check");
+        startInfo.ArgumentList.Add("--no-input");
+        startInfo.ArgumentList.Add("--prefer-binary");
         foreach (var arg in args)
             startInfo.ArgumentList.Add(arg);
 